@@ -0,0 +1,212 @@
+/*************************************************
+ *  Search on the sharded index of the fetch script
+ *
+ *  Replaces the Fuse based search of Academic. Instead of the whole index.json, the list of pages (search/docs.json)
+ *  and the shards of the query terms (search/shards/<first two characters>.json) are downloaded. The index is written
+ *  by scripts/fetch/searchindex.py, queries are normalized the same way as the indexed text.
+ **************************************************/
+
+const PREFIX_LENGTH = 2;
+const searchBase = search_config.indexURI.replace(/index\.json$/, 'search/');
+// version of the index (data/search_index.json), set in the page head
+const searchVersion = $('meta[name="search-index-version"]').attr('content') || '';
+
+let searchDocs = null;
+let searchShards = {};
+
+/* ---------------------------------------------------------------------------
+* Functions.
+* --------------------------------------------------------------------------- */
+
+// Get query from URI.
+function getSearchQuery(name) {
+  return decodeURIComponent((location.search.split(name + '=')[1] || '').split('&')[0]).replace(/\+/g, ' ');
+}
+
+// Set query in URI without reloading the page.
+function updateURL(url) {
+  if (history.replaceState) {
+    window.history.replaceState({path:url}, '', url);
+  }
+}
+
+// Split text into lower case words without accents, see tokenize in searchindex.py.
+function tokenize(text) {
+  return text.normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase().match(/[a-z0-9]+/g) || [];
+}
+
+function loadDocs() {
+  if (!searchDocs) {
+    searchDocs = $.getJSON(searchBase + 'docs.json?v=' + searchVersion);
+  }
+  return searchDocs;
+}
+
+// Shards are loaded once per page view, missing shards (no term with that prefix) are empty.
+function loadShard(prefix, version) {
+  if (!(prefix in searchShards)) {
+    let shard = $.Deferred();
+    $.getJSON(searchBase + 'shards/' + encodeURIComponent(prefix) + '.json?v=' + version)
+      .done(function(terms) { shard.resolve(terms); })
+      .fail(function() { shard.resolve({}); });
+    searchShards[prefix] = shard.promise();
+  }
+  return searchShards[prefix];
+}
+
+// Scores of the documents containing a term that starts with token. Exact matches count double.
+function matchToken(token, terms) {
+  let scores = {};
+  $.each(terms, function(term, postings) {
+    if (!term.startsWith(token)) {
+      return;
+    }
+    let factor = term === token ? 2 : 1;
+    for (let i = 0; i < postings.length; i += 2) {
+      scores[postings[i]] = (scores[postings[i]] || 0) + factor * postings[i + 1];
+    }
+  });
+  return scores;
+}
+
+// Pre-process new search query.
+function initSearch(force) {
+  let query = $("#search-query").val();
+
+  // If query deleted, clear results.
+  if (query.length < 1) {
+    $('#search-hits').empty();
+  }
+
+  // Check for timer event (enter key not pressed) and query less than minimum length required.
+  if (!force && query.length < Math.max(search_config.minLength, PREFIX_LENGTH))
+    return;
+
+  searchAcademic(query).done(function(results) {
+    // Drop results of outdated queries.
+    if ($("#search-query").val() !== query) {
+      return;
+    }
+    $('#search-hits').empty();
+    if (results.length > 0) {
+      $('#search-hits').append('<h3 class="mt-0">' + results.length + ' ' + i18n.results + '</h3>');
+      parseResults(query, results);
+    } else {
+      $('#search-hits').append('<div class="search-no-results">' + i18n.no_results + '</div>');
+    }
+  });
+  let newURL = window.location.protocol + "//" + window.location.host + window.location.pathname + '?q=' + encodeURIComponent(query) + window.location.hash;
+  updateURL(newURL);
+}
+
+// Perform search. Every word of the query has to match the beginning of a term of the document.
+function searchAcademic(query) {
+  let tokens = tokenize(query).filter(function(token) { return token.length >= PREFIX_LENGTH; });
+  let result = $.Deferred();
+  if (tokens.length < 1) {
+    return result.resolve([]).promise();
+  }
+
+  loadDocs().done(function(index) {
+    let shards = tokens.map(function(token) { return loadShard(token.substring(0, PREFIX_LENGTH), index.version); });
+    $.when.apply($, shards).done(function() {
+      let loaded = arguments;
+      let scores = null;
+      tokens.forEach(function(token, i) {
+        let matches = matchToken(token, loaded[i]);
+        if (scores === null) {
+          scores = matches;
+          return;
+        }
+        let combined = {};
+        $.each(scores, function(doc, score) {
+          if (doc in matches) {
+            combined[doc] = score + matches[doc];
+          }
+        });
+        scores = combined;
+      });
+
+      let results = Object.keys(scores).map(function(doc) {
+        let item = index.docs[doc];
+        return {score: scores[doc], item: {relpermalink: item[0], title: item[1], section: item[2], summary: item[3]}};
+      });
+      results.sort(function(a, b) { return b.score - a.score; });
+      result.resolve(results);
+    });
+  }).fail(function() {
+    result.resolve([]);
+  });
+  return result.promise();
+}
+
+// Parse search results.
+function parseResults(query, results) {
+  $.each(results, function(key, value) {
+    let content_key = value.item.section;
+
+    // Load template.
+    let template = $('#search-hit-fuse-template').html();
+
+    // Localize content types.
+    if (content_key in content_type) {
+      content_key = content_type[content_key];
+    }
+
+    // Parse template.
+    let templateData = {
+      key: key,
+      title: value.item.title,
+      type: content_key,
+      relpermalink: value.item.relpermalink,
+      snippet: value.item.summary
+    };
+    let output = render(template, templateData);
+    $('#search-hits').append(output);
+
+    // Highlight search terms in result.
+    $("#summary-" + key).mark(query);
+  });
+}
+
+function render(template, data) {
+  // Replace placeholders with their values.
+  let key, find, re;
+  for (key in data) {
+    find = '\\{\\{\\s*' + key + '\\s*\\}\\}';  // Expect placeholder in the form `{{x}}`.
+    re = new RegExp(find, 'g');
+    template = template.replace(re, data[key]);
+  }
+  return template;
+}
+
+/* ---------------------------------------------------------------------------
+* Initialize.
+* --------------------------------------------------------------------------- */
+
+$(function() {
+  // On page load, check for search query in URL.
+  let query = getSearchQuery('q');
+  if (query) {
+    $("body").addClass('searching');
+    $('.search-results').css({opacity: 0, visibility: "visible"}).animate({opacity: 1}, 200);
+    $("#search-query").val(query);
+    $("#search-query").focus();
+    initSearch(true);
+  }
+
+  // Load the page list as soon as the search box is used.
+  $('#search-query').one('focus', loadDocs);
+
+  // On search box key up, process query.
+  $('#search-query').keyup(function (e) {
+    clearTimeout($.data(this, 'searchTimer')); // Ensure only one timer runs!
+    if (e.keyCode == 13) {
+      initSearch(true);
+    } else {
+      $(this).data('searchTimer', setTimeout(function () {
+        initSearch(false);
+      }, 250));
+    }
+  });
+});
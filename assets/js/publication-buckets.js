@@ -0,0 +1,124 @@
+/*************************************************
+ *  Lazily loaded publication list
+ *
+ *  The publication section only renders the newest year. Older years are loaded from the buckets written by
+ *  scripts/fetch/fetch.py (static/publication-buckets) when the end of the list is scrolled into view, a year or
+ *  publication type is selected in the filters, or the list is searched. Loaded publications are rendered like
+ *  layouts/partials/li_citation.html (APA style) and inserted into the Isotope grid of the theme.
+ **************************************************/
+
+(function() {
+  let loader = document.getElementById('publication-buckets');
+  if (!loader) {
+    return;
+  }
+
+  let $grid = $('#container-publications');
+  let base = loader.dataset.base;
+  let version = loader.dataset.version;
+  let pdfLabel = loader.dataset.pdfLabel;
+  // years that were not loaded yet, newest first
+  let years = JSON.parse(loader.dataset.years);
+  let loaded = {};
+  let shown = new Set($grid.children('[data-url]').map(function() { return this.dataset.url; }).get());
+
+  // escapes text for element content and quoted attribute values
+  function escape(text) {
+    return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+      .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+  }
+
+  function renderAuthor(author) {
+    if (author.length > 1) {
+      return '<span><a href="' + escape(author[1]) + '">' + escape(author[0]) + '</a></span>';
+    }
+    return '<span>' + escape(author[0]) + '</span>';
+  }
+
+  function renderLink(link) {
+    let name = link[0] === 'PDF' ? pdfLabel : link[0];
+    return '<a class="btn btn-outline-primary my-1 mr-1 btn-sm" href="' + escape(link[1]) + '" target="_blank" rel="noopener">' + escape(name) + '</a>';
+  }
+
+  function render(record) {
+    let year = record.date.substring(0, 4);
+    let html = '<div class="grid-sizer col-lg-12 isotope-item pubtype-' + escape(record.type) + ' year-' + escape(year) +
+      '" data-date="' + escape(record.date) + '" data-url="' + escape(record.url) + '">' +
+      '<div class="pub-list-item" style="margin-bottom: 1rem">' +
+      '<i class="far fa-file-alt pub-icon" aria-hidden="true"></i> ' +
+      '<span class="article-metadata li-cite-author">' + record.authors.map(renderAuthor).join(', ') + '</span> ' +
+      '(' + year + '). <a href="' + escape(record.url) + '">' + escape(record.title) + '</a>. ';
+    if (record.publication) {
+      html += '<p>' + escape(record.publication) + '.</p>';
+    }
+    html += '<p>' + record.links.map(renderLink).join(' ') + '</p></div></div>';
+    return html;
+  }
+
+  function insert(records) {
+    let $items = $(records.filter(function(record) { return !shown.has(record.url); }).map(function(record) {
+      shown.add(record.url);
+      return render(record);
+    }).join(''));
+    if (!$items.length) {
+      return;
+    }
+    // Isotope is set up by the theme once the page is loaded, until then the items are sorted in the DOM
+    if ($grid.data('isotope')) {
+      $grid.isotope('insert', $items);
+      $grid.isotope({getSortData: {date: '[data-date]'}, sortBy: 'date', sortAscending: false});
+      $grid.isotope('updateSortData').isotope();
+    } else {
+      $grid.append($items);
+      $grid.children('.isotope-item').sort(function(a, b) {
+        return a.dataset.date < b.dataset.date ? 1 : a.dataset.date > b.dataset.date ? -1 : 0;
+      }).appendTo($grid);
+    }
+  }
+
+  function load(bucket) {
+    if (!(bucket in loaded)) {
+      loaded[bucket] = $.getJSON(base + bucket + '.json?v=' + version).done(insert);
+    }
+    return loaded[bucket];
+  }
+
+  function loadYear(year) {
+    years = years.filter(function(y) { return y !== year; });
+    return load('year-' + year);
+  }
+
+  function loadAll() {
+    return $.when.apply($, years.slice().map(loadYear));
+  }
+
+  // Load the next year while the end of the list is visible.
+  if ('IntersectionObserver' in window) {
+    let observer = new IntersectionObserver(function(entries) {
+      if (!entries[0].isIntersecting || !years.length) {
+        return;
+      }
+      loadYear(years[0]).always(function() {
+        // the observer only fires on changes, check again if the end of the list is still visible
+        observer.unobserve(loader);
+        if (years.length) {
+          observer.observe(loader);
+        }
+      });
+    }, {rootMargin: '400px'});
+    observer.observe(loader);
+  } else {
+    loadAll();
+  }
+
+  // Filters need the publications they select to be loaded.
+  $('.pub-filters').on('change', function() {
+    let value = this.value;
+    if (value.indexOf('.year-') === 0) {
+      loadYear(value.substring(6));
+    } else if (value.indexOf('.pubtype-') === 0) {
+      load('type-' + value.substring(9));
+    }
+  });
+  $('.filter-search').one('keyup', loadAll);
+})();
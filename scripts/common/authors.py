@@ -0,0 +1,123 @@
+import re
+import unicodedata
+
+# german umlauts are transliterated the way the ids of existing profiles were created, e.g. Jürgen -> juergen
+UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'sz', 'Ä': 'Ae', 'Ö': 'Oe', 'Ü': 'Ue'})
+
+
+def _strip_accents(text):
+    text = unicodedata.normalize('NFKD', text)
+    return unicodedata.normalize('NFC', ''.join(c for c in text if not unicodedata.combining(c)))
+
+
+def ascii_name(name):
+    # name with umlauts transliterated and all other accents removed, e.g. "Jürgen Čech" -> "Juergen Cech"
+    return _strip_accents(name.translate(UMLAUTS))
+
+
+def person_id(name):
+    # id of the profile of a person, e.g. "Michael Schröder" -> "michael-schroeder"
+    return ascii_name(name).lower().replace(' ', '-')
+
+
+def _words(name):
+    return re.findall(r'[a-z0-9]+', name.lower())
+
+
+def _keys(name):
+    # lookup keys of a name: lower case words with umlauts transliterated and with umlauts stripped, so "Jürgen",
+    # "Juergen" and "Jurgen" all match. Ids (e.g. "juergen-cito") have the same keys as the names they were made of
+    return {' '.join(_words(ascii_name(name))), ' '.join(_words(_strip_accents(name)))}
+
+
+class AuthorResolver:
+    # Matches author names and TISS oids to profile ids. The index is built once, every lookup is a dictionary lookup:
+    # names are matched by their full name (ignoring case, accents and punctuation), by initials and last name (e.g.
+    # "M. Wimmer", only if the initials are unique, can be turned off per lookup) and through the transform table of
+    # the config, which maps names used by publik to the names of the profiles. Names that cannot be resolved although
+    # a person with that last name is known are collected in unresolved, they most likely need a transform record.
+
+    def __init__(self, people=(), transform=None):
+        self._names = {}
+        self._initials = {}
+        self._oids = {}
+        self._display = {}
+        self._last_names = set()
+        self._transform = {}
+        self.unresolved = set()
+        for name, target in (transform or {}).items():
+            for key in _keys(name):
+                self._transform[key] = target
+        for person in people:
+            self.add(person['identifier'], person['first_name'], person['last_name'], oid=person.get('oid'))
+
+    @staticmethod
+    def _index(index, key, identifier):
+        # keys shared by different people are ambiguous and resolve to None
+        if index.get(key, identifier) != identifier:
+            identifier = None
+        index[key] = identifier
+
+    def add(self, identifier, first_name, last_name, oid=None):
+        self._display[identifier] = ascii_name(f'{first_name} {last_name}')
+        if oid is not None:
+            self._oids[str(oid)] = identifier
+        for key in _keys(f'{first_name} {last_name}') | _keys(identifier):
+            self._index(self._names, key, identifier)
+
+        last_keys = _keys(last_name)
+        self._last_names |= {key.rpartition(' ')[2] for key in last_keys}
+        given = [_words(ascii_name(first_name)), _words(_strip_accents(first_name))]
+        for words in given:
+            if not words:
+                continue
+            # initials of all first names and of the first one only, e.g. "V. G. Dulca" and "V. Dulca"
+            for initials in {' '.join(w[0] for w in words), words[0][0]}:
+                for key in last_keys:
+                    self._index(self._initials, f'{initials} {key}', identifier)
+
+    def __contains__(self, identifier):
+        return identifier in self._display
+
+    def add_profile(self, identifier, name):
+        # profiles only have a full name, the last word is taken as last name
+        first_name, _, last_name = name.strip().rpartition(' ')
+        self.add(identifier, first_name, last_name)
+
+    def _transformed(self, name):
+        for key in _keys(name):
+            if key in self._transform:
+                return self._transform[key]
+        return name
+
+    def resolve(self, name, initials=True):
+        # returns the id of the person or None. Without initials, only full names and transformed names are matched
+        name = self._transformed(name)
+        keys = _keys(name)
+        for key in keys:
+            if self._names.get(key):
+                return self._names[key]
+
+        if not initials:
+            return None
+
+        # names consisting of initials and a last name, e.g. "M. Wimmer" or "M Wimmer"
+        for key in keys:
+            words = key.split(' ')
+            if len(words) > 1 and all(len(word) == 1 for word in words[:-1]):
+                for initials in (' '.join(words[:-1]), words[0]):
+                    if self._initials.get(f'{initials} {words[-1]}'):
+                        return self._initials[f'{initials} {words[-1]}']
+
+        if any(key.rpartition(' ')[2] in self._last_names for key in keys):
+            self.unresolved.add(name)
+        return None
+
+    def resolve_oid(self, oid):
+        return self._oids.get(str(oid))
+
+    def canonical(self, name):
+        # the name an author is written as: the name of the person without accents (so the templates find the
+        # profile), the transformed name for everyone else
+        identifier = self.resolve(name)
+        return self._display[identifier] if identifier else self._transformed(name)
@@ -0,0 +1,124 @@
+import os
+import pickle
+
+import frontmatter
+
+PAGE_FILES = ('index.md', '_index.md')
+
+
+class ContentIndex:
+    # Index of the files of the content directory and the front matter of its markdown files. The directory is scanned
+    # once (and again on refresh), existence checks and listings are answered from memory. Front matter is parsed when
+    # it is first asked for and cached by path, modification time and size, so a file is only parsed again after it
+    # changed. With a cache path, the parsed front matter is kept between runs.
+    # Paths are passed and returned like the scripts build them, i.e. starting with the content directory.
+
+    def __init__(self, content_dir, cache_path=None):
+        self.content_dir = content_dir.rstrip('/')
+        self.cache_path = cache_path
+        self.files = None
+        self.directories = None
+        self.parsed = 0
+        # relative path -> (mtime, size, metadata)
+        self._metadata = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    self._metadata = pickle.load(f)
+            except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+                pass
+
+    def _key(self, path):
+        return os.path.relpath(path, self.content_dir).replace(os.sep, '/')
+
+    def _path(self, key):
+        return f'{self.content_dir}/{key}'
+
+    def _scan(self):
+        if self.files is None:
+            self.refresh()
+
+    def refresh(self):
+        # scans the content directory again, has to be called to see files that were created or removed since the last
+        # scan. Changed files are parsed again on their next lookup anyway
+        self.files = {}
+        self.directories = set()
+        for root, dirs, files in os.walk(self.content_dir):
+            key = self._key(root)
+            if key != '.':
+                self.directories.add(key)
+            for name in files:
+                stat = os.stat(f'{root}/{name}')
+                self.files[name if key == '.' else f'{key}/{name}'] = (stat.st_mtime_ns, stat.st_size)
+        # forget the front matter of removed files
+        for key in set(self._metadata) - set(self.files):
+            del self._metadata[key]
+
+    def add(self, path):
+        # registers a file or directory created since the last scan, so exists finds it without a refresh
+        self._scan()
+        key = self._key(path)
+        if os.path.isdir(path):
+            self.directories.add(key)
+        else:
+            stat = os.stat(path)
+            self.files[key] = (stat.st_mtime_ns, stat.st_size)
+        while '/' in key:
+            key = key.rsplit('/', 1)[0]
+            self.directories.add(key)
+
+    def exists(self, path):
+        self._scan()
+        key = self._key(path)
+        return key in self.files or key in self.directories
+
+    def ids(self, section):
+        # names of the page bundles in a section, e.g. the profile ids of "people", sorted by name
+        self._scan()
+        ids = set()
+        for key in self.files:
+            parts = key.split('/')
+            if len(parts) == 3 and parts[0] == section and parts[2] in PAGE_FILES:
+                ids.add(parts[1])
+        return sorted(ids)
+
+    def pages(self, section):
+        # paths of all markdown files of a section including its subsections, sorted by directory and name (the
+        # files of a directory come before the files of its subdirectories)
+        self._scan()
+        keys = [key for key in self.files if key.startswith(section + '/') and key.endswith('.md')]
+        return [self._path(key) for key in sorted(keys, key=lambda key: key.rsplit('/', 1))]
+
+    def metadata(self, path):
+        # Returns the front matter of a markdown file as dict or None if the file does not exist. The dict is shared
+        # with the cache and must not be modified, load the file with frontmatter to change it
+        self._scan()
+        key = self._key(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.files.pop(key, None)
+            self._metadata.pop(key, None)
+            return None
+
+        version = (stat.st_mtime_ns, stat.st_size)
+        self.files[key] = version
+        cached = self._metadata.get(key)
+        if cached is not None and cached[:2] == version:
+            return cached[2]
+
+        # frontmatter.load fails for pages with a "content" parameter, parse the text instead
+        with open(path, 'r', encoding='utf-8') as f:
+            metadata, _ = frontmatter.parse(f.read())
+        self._metadata[key] = (*version, metadata)
+        self.parsed += 1
+        return metadata
+
+    def save(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self._metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
@@ -0,0 +1,76 @@
+import os
+import threading
+
+
+class OutputWriter:
+    # Writes generated files only if their content changed. Unchanged files keep their mtime, so neither hugo nor git
+    # see a modification. Changed files are written to a temporary file next to the target and renamed afterwards,
+    # readers therefore never see a partially written file.
+
+    def __init__(self):
+        self.written = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def _count(self, written):
+        with self._lock:
+            if written:
+                self.written += 1
+            else:
+                self.skipped += 1
+
+    def skip(self):
+        # records a file that was left untouched without comparing its content
+        self._count(False)
+
+    def write(self, path, content):
+        # returns True if the file was written
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                if f.read() == content:
+                    self._count(False)
+                    return False
+        except (OSError, UnicodeDecodeError):
+            pass
+
+        self._replace(path, content.encode('utf-8'))
+        self._count(True)
+        return True
+
+    def copy(self, source, path):
+        # copies a binary file (e.g. an image), returns True if the file was written
+        with open(source, 'rb') as f:
+            return self.write_bytes(path, f.read())
+
+    def write_bytes(self, path, content):
+        # writes binary content (e.g. a downloaded image), returns True if the file was written
+        try:
+            if os.path.getsize(path) == len(content):
+                with open(path, 'rb') as f:
+                    if f.read() == content:
+                        self._count(False)
+                        return False
+        except OSError:
+            pass
+
+        self._replace(path, content)
+        self._count(True)
+        return True
+
+    @staticmethod
+    def _replace(path, content):
+        directory, name = os.path.split(path)
+        tmp_path = os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            if os.path.exists(path):
+                os.chmod(tmp_path, os.stat(path).st_mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def summary(self):
+        return f'{self.written} files written, {self.skipped} unchanged'
@@ -0,0 +1,348 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+import requests
+
+import fetch
+from client import FetchExecutor
+from manifest import Manifest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.authors import AuthorResolver, person_id  # noqa: E402
+from common.content import ContentIndex  # noqa: E402
+from common.output import OutputWriter  # noqa: E402
+
+FIRST_NAMES = ['Anna', 'Bernhard', 'Christiane', 'Daniel', 'Eva', 'Franz', 'Gerti', 'Hannes', 'Iris', 'Jürgen',
+               'Katharina', 'Lukas', 'Maria', 'Norbert', 'Olga', 'Peter', 'Renate', 'Stefan', 'Theresa', 'Ulrich']
+LAST_NAMES = ['Bauer', 'Gruber', 'Huber', 'Köhler', 'Lang', 'Mayer', 'Pichler', 'Schröder', 'Steiner', 'Wagner',
+              'Weiß', 'Winkler', 'Wolf', 'Berger', 'Fuchs', 'Hofer', 'Moser', 'Eder', 'Leitner', 'Brunner']
+
+# (publik type, type specific element, BibTeX type)
+PUB_TYPES = [
+    ('Beitrag in Tagungsband', 'beitrag_tagungsband', 'inproceedings'),
+    ('Zeitschriftenartikel', 'zeitschriftenartikel', 'article'),
+    ('Buchbeitrag', 'buchbeitrag', 'incollection'),
+    ('Vortrag ohne Tagungsband', 'vortrag_poster_ohne_tagungsband', 'misc'),
+    ('Wissenschaftlicher Bericht', 'bericht', 'techreport'),
+]
+COURSE_TYPES = ['VO', 'VU', 'UE', 'SE', 'PR', 'PV']
+SEMESTER = '2020S'
+
+
+class Dataset:
+    # Synthetic org unit, course, pubexport and BibTeX data of a group with the given number of people.
+    # Responses are rendered up front, so serving them does not distort the measurements.
+
+    def __init__(self, people, publications, courses_per_person=4, seed=0):
+        rnd = random.Random(seed)
+
+        self.people = []
+        for i in range(people):
+            first_name = FIRST_NAMES[i % len(FIRST_NAMES)]
+            last_name = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+            suffix = i // (len(FIRST_NAMES) * len(LAST_NAMES))
+            if suffix:
+                last_name += f'-{suffix}'
+            self.people.append({
+                'tiss_id': 100000 + i, 'oid': 2000000 + i, 'first_name': first_name, 'last_name': last_name,
+                'preceding_titles': 'Dipl.-Ing.', 'picture_uri': None, 'main_phone_number': f'+43 1 58801 {i}',
+                'main_email': f'person{i}@tuwien.ac.at', 'other_emails': [f'person{i}@big.tuwien.ac.at'],
+                'room_code': f'HC{i:04d}',
+            })
+
+        self.org_unit = json.dumps({'employees': self.people}).encode('utf-8')
+
+        course_ns = f'{fetch.TISS_BASE}/api/schemas/course/v10'
+        self.courses = {}
+        for person in self.people:
+            records = []
+            for _ in range(courses_per_person):
+                number = f'188{rnd.randint(0, people * 2):03d}'
+                lecturers = [person] + rnd.sample(self.people, min(2, len(self.people)))
+                oids = ''.join(f'<oid>{p["oid"]}</oid>' for p in lecturers)
+                records.append(
+                    f'<course><courseNumber>{number}</courseNumber><semesterCode>{SEMESTER}</semesterCode>'
+                    f'<courseType>{rnd.choice(COURSE_TYPES)}</courseType>'
+                    f'<url>https://tiss.tuwien.ac.at/course/courseDetails.xhtml?courseNr={number}</url>'
+                    f'<title><de>Kurs {number}</de><en>Course {number}</en></title>'
+                    f'<lecturers>{oids}</lecturers></course>'
+                )
+            self.courses[str(person['oid'])] = (
+                f'<?xml version="1.0" encoding="UTF-8"?><tuvienna xmlns="{course_ns}">{"".join(records)}</tuvienna>'
+            ).encode('utf-8')
+
+        pub_records = {self._key(p): [] for p in self.people}
+        bib_records = {self._key(p): [] for p in self.people}
+        all_pubs = []
+        all_bibs = []
+        for i in range(publications):
+            pub_type, element, bib_type = rnd.choice(PUB_TYPES)
+            authors = rnd.sample(self.people, min(rnd.randint(1, 3), len(self.people)))
+            names = [(a['first_name'], a['last_name']) for a in authors] + [('Max', 'Extern')] * rnd.randint(0, 2)
+            year = rnd.randint(1995, 2020)
+            title = f'On the {rnd.choice(["modeling", "versioning", "execution", "testing"])} of models, part {i}'
+            author_info = ''.join(
+                f'<autor_info><vorname_lang>{first}</vorname_lang><nachname>{last}</nachname></autor_info>'
+                for first, last in names
+            )
+            clean = ', '.join(f'{first[0]}. {last}' for first, last in names)
+            pub = (
+                f'<publikation><reference>{escape(clean)}: &lt;br&gt;"{title}"; in: Proceedings; {year}.'
+                f'&lt;br&gt;&lt;br&gt;</reference>'
+                f'<infolink>https://publik.tuwien.ac.at/showentry.php?ID={i}</infolink>'
+                f'<pub_id>TUW-{i}</pub_id><type>{pub_type}</type><autoren_clean>{clean}</autoren_clean>'
+                f'{author_info}<titel>{title}.</titel><{element}><jahr>{year}</jahr></{element}>'
+                f'<abstract_englisch>Abstract of publication {i}.&lt;br&gt;</abstract_englisch></publikation>'
+            )
+            bib = (
+                f'@{bib_type}{{TUW-{i},\n  author = {{{" and ".join(f"{f} {l}" for f, l in names)}}},\n'
+                f'  title = {{{title}}},\n  year = {{{year}}},\n  month = jan\n}}\n\n'
+            )
+            all_pubs.append(pub)
+            all_bibs.append(bib)
+            for author in authors:
+                pub_records[self._key(author)].append(pub)
+                bib_records[self._key(author)].append(bib)
+
+        self.pubexport = {key: self._export(records) for key, records in pub_records.items()}
+        self.pubexport[None] = self._export(all_pubs)
+        self.pubbibtex = {key: self._bibtex(records) for key, records in bib_records.items()}
+        self.pubbibtex[None] = self._bibtex(all_bibs)
+
+    @staticmethod
+    def _key(person):
+        return person['first_name'], person['last_name']
+
+    @staticmethod
+    def _export(records):
+        return ('<?xml version="1.0" encoding="ISO-8859-1"?><export>' + ''.join(records) + '</export>')\
+            .encode('ISO-8859-1', 'replace')
+
+    @staticmethod
+    def _bibtex(records):
+        return ('BibTeX-Export: synthetic\n\n' + ''.join(records) + 'von publik ausgegeben\n')\
+            .encode('ISO-8859-1', 'replace')
+
+
+class StandInServer:
+    # Serves a Dataset on localhost and counts requests and transferred bytes per endpoint
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.base = f'http://127.0.0.1:{self._server.server_port}'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                key = (query['vorname'], query['zuname']) if 'zuname' in query else None
+                if url.path.startswith('/api/orgunit/'):
+                    body = server.dataset.org_unit
+                elif url.path.startswith('/api/course/lecturer/'):
+                    body = server.dataset.courses.get(url.path.rsplit('/', 1)[1], b'<tuvienna/>')
+                elif url.path == '/pubexport.php':
+                    body = server.dataset.pubexport.get(key, Dataset._export([]))
+                elif url.path == '/pubbibtex.php':
+                    body = server.dataset.pubbibtex.get(key, Dataset._bibtex([]))
+                else:
+                    self.send_error(404)
+                    return
+
+                with server._lock:
+                    server.requests += 1
+                    server.bytes += len(body)
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        fetch.PEOPLE_URL = f'{self.base}/api/orgunit/v22/id/{fetch.BIG_TID}?persons=true'
+        fetch.COURSE_URL = self.base + '/api/course/lecturer/{}'
+        fetch.PUBLICATION_URL = f'{self.base}/pubexport.php'
+        fetch.BIBTEX_URL = f'{self.base}/pubbibtex.php'
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def measure(name, server, fn, memory=True):
+    # runs fn and records wall time, cpu time, request count and peak memory of the call
+    requests_before, bytes_before = server.requests, server.bytes
+    if memory:
+        tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    # progress output of the fetch functions would drown the results
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = fn()
+    stats = {
+        'wall': round(time.perf_counter() - wall, 4),
+        'cpu': round(time.process_time() - cpu, 4),
+        'requests': server.requests - requests_before,
+        'bytes': server.bytes - bytes_before,
+    }
+    if memory:
+        stats['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print(f'  {name:<20} {stats["wall"]:>9.3f}s {stats["requests"]:>7} requests')
+    return result, stats
+
+
+def run(people, publications, args):
+    print(f'Benchmarking {people} people and {publications} publications.')
+    dataset = Dataset(people, publications, courses_per_person=args.courses, seed=args.seed)
+    stages = {}
+
+    with StandInServer(dataset) as server, tempfile.TemporaryDirectory() as tmp:
+        session = requests.Session()
+        executor = FetchExecutor(session, max_workers=args.workers, per_host=args.per_host)
+        bulk = [{}] if args.bulk else None
+
+        employees, stages['people'] = measure(
+            'people', server, lambda: session.get(fetch.PEOPLE_URL).json()['employees'], args.memory)
+        for person in employees:
+            person['identifier'] = person_id(person['first_name'] + ' ' + person['last_name'])
+
+        _, stages['courses'] = measure(
+            'courses', server, lambda: fetch.load_courses(employees, semester=SEMESTER, session=session,
+                                                          executor=executor), args.memory)
+        bib_store, stages['bibtex'] = measure(
+            'bibtex', server, lambda: fetch.load_bibtex(employees, session=session, executor=executor, bulk=bulk),
+            args.memory)
+        resolver = AuthorResolver(employees)
+        posts, stages['publications'] = measure(
+            'publications', server, lambda: fetch.load_publications(employees, bib_store, resolver, session=session,
+                                                                    executor=executor, bulk=bulk), args.memory)
+
+        people_dir = f'{tmp}/people'
+        os.makedirs(people_dir)
+        writer = OutputWriter()
+
+        content = ContentIndex(tmp)
+
+        def write_people():
+            fetch.sync_people(employees, people_dir, 'templates', writer)
+            content.refresh()
+            fetch.sync_groups(content, {}, 'Members', writer)
+
+        _, stages['people_writer'] = measure('people_writer', server, write_people, args.memory)
+        _, stages['publication_writer'] = measure(
+            'publication_writer', server,
+            lambda: fetch.sync_publications(posts, bib_store, content, Manifest(f'{tmp}/manifest.json'), writer),
+            args.memory)
+
+    return {'people': people, 'publications': publications, 'stages': stages}
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    baseline_runs = {(r['people'], r['publications']): r for r in baseline['runs']}
+
+    print(f'Wall time compared to {baseline_path}:')
+    for result in results['runs']:
+        old = baseline_runs.get((result['people'], result['publications']))
+        if not old:
+            continue
+        print(f'{result["people"]} people, {result["publications"]} publications')
+        for stage, stats in result['stages'].items():
+            if stage not in old['stages']:
+                continue
+            before = old['stages'][stage]['wall']
+            ratio = stats['wall'] / before if before else float('inf')
+            print(f'  {stage:<20} {before:>9.3f}s -> {stats["wall"]:>9.3f}s ({ratio:.2f}x)')
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Benchmarks the stages of the fetch script against synthetic '
+                                                    'TISS and publik data served from localhost.')
+    argparser.add_argument('-p', '--people',
+                           help='group sizes to benchmark. Defaults to 50 500',
+                           nargs='+', default=[50, 500], type=int,
+                           metavar='N', dest='people')
+    argparser.add_argument('-n', '--publications',
+                           help='number of publications. Defaults to 20 per person',
+                           type=int,
+                           metavar='N', dest='publications')
+    argparser.add_argument('--courses',
+                           help='number of courses per person. Defaults to 4',
+                           default=4, type=int,
+                           metavar='N', dest='courses')
+    argparser.add_argument('--bulk',
+                           help='fetch publications with a single division wide query', action='store_true',
+                           dest='bulk')
+    argparser.add_argument('-w', '--workers',
+                           help='maximum number of concurrent requests. Defaults to 8',
+                           default=8, type=int,
+                           metavar='N', dest='workers')
+    argparser.add_argument('--per-host',
+                           help='maximum number of concurrent requests per host. Defaults to 4',
+                           default=4, type=int,
+                           metavar='N', dest='per_host')
+    argparser.add_argument('--no-memory',
+                           help='do not trace memory allocations. Tracing slows down allocation heavy stages',
+                           action='store_false',
+                           dest='memory')
+    argparser.add_argument('--seed',
+                           help='seed of the synthetic data. Defaults to 0',
+                           default=0, type=int,
+                           dest='seed')
+    argparser.add_argument('-o', '--output',
+                           help='provide the path of the result file. Defaults to "benchmark.json"',
+                           default='benchmark.json',
+                           metavar='PATH', dest='output')
+    argparser.add_argument('--compare',
+                           help='compare the results with a previous result file',
+                           metavar='PATH', dest='baseline')
+    args = argparser.parse_args()
+
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {'workers': args.workers, 'per_host': args.per_host, 'bulk': args.bulk, 'memory': args.memory,
+                     'courses': args.courses, 'seed': args.seed},
+        'runs': [run(people, args.publications or people * 20, args) for people in args.people],
+    }
+
+    with open(args.output, 'w+', encoding='utf-8') as f:
+        json.dump(results, f, indent=4)
+    print(f'Results written to "{args.output}".')
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
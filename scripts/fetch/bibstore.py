@@ -0,0 +1,91 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import bibtexparser
+
+# entries start with an @ at the beginning of a line, followed by the entry type and the ID
+ENTRY_START = re.compile(r'^@\s*(\w+)\s*[{(]\s*([^,\s]*)', re.MULTILINE)
+
+# parsing is done inline if there are fewer entries, starting worker processes would take longer
+PARALLEL_THRESHOLD = 500
+
+
+def split_entries(text):
+    # splits a BibTeX string into (entry type, ID, raw entry) tuples. Text before the first entry is dropped
+    starts = list(ENTRY_START.finditer(text))
+    for match, end in zip(starts, [m.start() for m in starts[1:]] + [len(text)]):
+        yield match.group(1).lower(), match.group(2), text[match.start():end].strip() + '\n'
+
+
+def _parse(bibtex):
+    parser = bibtexparser.bparser.BibTexParser(common_strings=True)
+    parser.customization = bibtexparser.customization.convert_to_unicode
+    parser.ignore_nonstandard_types = False
+    return bibtexparser.loads(bibtex_str=bibtex, parser=parser).entries
+
+
+def load_database(texts, max_workers=None):
+    # Builds a BibDatabase from several BibTeX strings (e.g. one per person). Entries are split off without parsing
+    # first, so repetitions of an already seen entry can be dropped before the expensive parsing step. The remaining
+    # entries are parsed and unicode-normalized in chunks on a process pool.
+    # The order of the entries matches the order in which they appear in texts.
+    strings = []
+    entries = []
+    seen = {}
+    for text in texts:
+        for entry_type, entry_id, raw in split_entries(text):
+            if entry_type == 'comment':
+                continue
+            if entry_type in ('string', 'preamble'):
+                strings.append(raw)
+                continue
+            key = entry_id.casefold()
+            # identical repetitions are dropped, differing entries with the same ID are kept for conflict detection
+            if key in seen and raw in seen[key]:
+                continue
+            seen.setdefault(key, set()).add(raw)
+            entries.append(raw)
+
+    # string definitions are needed by every chunk
+    prefix = ''.join(strings)
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(entries) < PARALLEL_THRESHOLD:
+        parsed = [_parse(prefix + ''.join(entries))]
+    else:
+        size = -(-len(entries) // (workers * 4))
+        chunks = [prefix + ''.join(entries[i:i + size]) for i in range(0, len(entries), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse, chunks))
+
+    database = bibtexparser.bibdatabase.BibDatabase()
+    database.entries = [entry for chunk in parsed for entry in chunk]
+    return database
+
+
+class BibStore:
+    # Wraps a parsed BibDatabase and indexes its entries by their case folded ID, so publications can be matched to
+    # their BibTeX records in constant time.
+    # The database is fetched per person, so co-authored entries show up several times. Identical repetitions are
+    # expected and ignored; entries that share an ID but differ in content are collected in `conflicts`.
+    # The first entry of an ID always wins.
+
+    def __init__(self, database):
+        self.database = database
+        self.conflicts = {}
+        self._index = {}
+
+        for entry in database.entries:
+            key = entry['ID'].casefold()
+            first = self._index.setdefault(key, entry)
+            if first is not entry and first != entry:
+                self.conflicts.setdefault(key, []).append(entry)
+
+    def get(self, entry_id):
+        return self._index.get(entry_id.casefold())
+
+    def __contains__(self, entry_id):
+        return entry_id.casefold() in self._index
+
+    def __len__(self):
+        return len(self._index)
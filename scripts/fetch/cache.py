@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class OfflineCacheMiss(requests.RequestException):
+    pass
+
+
+class ResponseCache:
+    # Stores GET responses on disk. Every entry consists of a json file holding the metadata (url, validators, time of
+    # the last successful check) and a file holding the raw body. Entries are keyed by the full url including the query.
+
+    def __init__(self, directory, ttl=3600):
+        self.directory = directory
+        self.ttl = ttl
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        directory = f'{self.directory}/{key[:2]}'
+        return f'{directory}/{key}.json', f'{directory}/{key}.body'
+
+    def load(self, key):
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def store(self, key, meta, body=None):
+        meta_path, body_path = self._paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # write to temp files first, a crashed run must never leave a truncated entry behind
+        suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        if body is not None:
+            with open(body_path + suffix, 'wb') as f:
+                f.write(body)
+            os.replace(body_path + suffix, body_path)
+        with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + suffix, meta_path)
+
+    def is_fresh(self, meta):
+        return time.time() - meta['checked'] < self.ttl
+
+
+class CachingSession(requests.Session):
+    # A session that serves GET requests from a ResponseCache.
+    # Entries with an ETag or Last-Modified header are revalidated with a conditional request on every use,
+    # entries without validators are reused until the ttl of the cache expires.
+    # In offline mode every request is answered from the cache and a miss raises OfflineCacheMiss.
+
+    def __init__(self, cache, offline=False):
+        super().__init__()
+        self.cache = cache
+        self.offline = offline
+        self.stats = {'hits': 0, 'revalidated': 0, 'downloaded': 0, 'bytes': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, stat, size=0):
+        with self._stats_lock:
+            self.stats[stat] += 1
+            self.stats['bytes'] += size
+
+    def request(self, method, url, params=None, headers=None, stream=False, **kwargs):
+        if method.upper() != 'GET' or stream:
+            return super().request(method, url, params=params, headers=headers, stream=stream, **kwargs)
+
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        key = self.cache.key(full_url)
+        entry = self.cache.load(key)
+
+        if self.offline:
+            if not entry:
+                raise OfflineCacheMiss(f'No cached response for {full_url}')
+            self._count('hits')
+            return self._cached_response(*entry)
+
+        conditional_headers = {}
+        if entry:
+            meta, body = entry
+            validators = meta['validators']
+            if not validators and self.cache.is_fresh(meta):
+                self._count('hits')
+                return self._cached_response(meta, body)
+            if 'ETag' in validators:
+                conditional_headers['If-None-Match'] = validators['ETag']
+            if 'Last-Modified' in validators:
+                conditional_headers['If-Modified-Since'] = validators['Last-Modified']
+
+        r = super().request(method, full_url, headers={**(headers or {}), **conditional_headers}, **kwargs)
+
+        if r.status_code == 304 and entry:
+            meta, body = entry
+            meta['checked'] = time.time()
+            self.cache.store(key, meta)
+            self._count('revalidated')
+            cached = self._cached_response(meta, body)
+            # keeps the latency of the revalidation, responses served without a request have none
+            cached.elapsed = r.elapsed
+            return cached
+
+        if r.status_code == 200:
+            validators = {h: r.headers[h] for h in ('ETag', 'Last-Modified') if h in r.headers}
+            meta = {
+                'url': full_url,
+                'checked': time.time(),
+                'validators': validators,
+                'headers': {h: r.headers[h] for h in ('Content-Type',) if h in r.headers},
+            }
+            self.cache.store(key, meta, r.content)
+        self._count('downloaded', len(r.content))
+
+        return r
+
+    @staticmethod
+    def _cached_response(meta, body):
+        r = requests.Response()
+        r.status_code = 200
+        r.reason = 'OK'
+        r.url = meta['url']
+        r.headers = CaseInsensitiveDict(meta['headers'])
+        r._content = body
+        r._content_consumed = True
+        return r
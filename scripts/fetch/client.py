@@ -0,0 +1,208 @@
+import email.utils
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# responses with these status codes are retried and count as a sign of overload
+RETRY_STATUS = {429, 500, 502, 503, 504}
+SLOW_FACTOR = 4
+# responses faster than this (in seconds) never count as slow, jitter of fast responses is no sign of overload
+SLOW_LATENCY = 1.0
+# number of responses of an endpoint before its average is used to detect slow responses
+SLOW_SAMPLES = 10
+# seconds to wait for a connection to a host, the read timeout is set per executor
+CONNECT_TIMEOUT = 10
+
+
+class HostUnavailable(requests.RequestException):
+    pass
+
+
+class HostState:
+    # Concurrency limit, circuit breaker and statistics of a single host.
+    # The limit follows an AIMD scheme: every successful response raises it by 1/limit (about one per round of
+    # requests), a throttled or failed response halves it. A response also counts as a sign of overload if the
+    # server took more than SLOW_LATENCY seconds and more than SLOW_FACTOR times the average time of the endpoint (the
+    # path of the url) to answer. Response times differ a lot between the endpoints, so every endpoint has its own
+    # average, which has to settle first.
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        # endpoint -> (number of measured responses, average latency)
+        self.averages = {}
+        self.consecutive_failures = 0
+        self.open_until = 0
+        self.condition = threading.Condition()
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'failures': 0, 'latency': 0.0, 'measured': 0,
+                      'min_limit': self.limit}
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def count(self, stat):
+        with self.condition:
+            self.stats[stat] += 1
+
+    def open_failures(self):
+        # the number of failures in a row if the circuit is open, otherwise None
+        with self.condition:
+            return self.consecutive_failures if self.open_until > time.monotonic() else None
+
+    def fail(self, threshold, cooldown):
+        # records a request that failed after all retries, opens the circuit after threshold failures in a row
+        with self.condition:
+            self.stats['failures'] += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= threshold:
+                # half open after the cooldown: the next request decides whether the circuit closes again
+                self.open_until = time.monotonic() + cooldown
+
+    def record(self, ok, latency=None, endpoint=None):
+        # latency is the time until the response headers arrived, None for errors and responses from the cache
+        with self.condition:
+            self.stats['requests'] += 1
+            if ok:
+                self.consecutive_failures = 0
+            slow = False
+            if latency:
+                self.stats['latency'] += latency
+                self.stats['measured'] += 1
+                count, average = self.averages.get(endpoint, (0, latency))
+                slow = count >= SLOW_SAMPLES and latency > max(SLOW_LATENCY, SLOW_FACTOR * average)
+                self.averages[endpoint] = count + 1, 0.8 * average + 0.2 * latency
+
+            if ok and not slow:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(1.0, self.limit / 2)
+                self.stats['min_limit'] = min(self.stats['min_limit'], self.limit)
+            self.condition.notify_all()
+
+
+class FetchExecutor:
+    # Runs GET requests on a bounded worker pool and limits the number of requests that are in flight per host.
+    # Results are always returned in the order the work was submitted, so the output of a concurrent run is the
+    # same as the output of a sequential one.
+    # The per host limit adapts to the responses of the host (see HostState), per_host is its upper bound.
+    # Every request gets a connect timeout of CONNECT_TIMEOUT and a read timeout of timeout seconds unless the caller
+    # passes its own, so a stalled host cannot block a worker forever.
+    # Failed requests (connection errors, timeouts and RETRY_STATUS responses) are retried with jittered exponential
+    # backoff, a Retry-After header of the host is honoured up to max_delay seconds. After failure_threshold requests
+    # to a host failed in a row, the circuit of the host opens and further requests fail immediately with
+    # HostUnavailable for cooldown seconds, so a run against a broken api fails fast.
+
+    def __init__(self, session=None, max_workers=8, per_host=4, retries=3, backoff=0.5, failure_threshold=5,
+                 cooldown=60, timeout=60, max_delay=60):
+        self.session = session if session is not None else requests.Session()
+        self.max_workers = max(1, max_workers)
+        self.per_host = max(1, per_host)
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.timeout = (min(CONNECT_TIMEOUT, timeout), timeout)
+        self.max_delay = max_delay
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+        # the default pool of requests only keeps 10 connections per host alive, make sure every worker can reuse one
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostState(self.per_host)
+            return host, self._hosts[host]
+
+    def _delay(self, attempt, r=None):
+        # honours Retry-After of throttled responses (capped at max_delay), otherwise and for headers that cannot be
+        # parsed full jitter exponential backoff
+        backoff = random.uniform(0, self.backoff * 2 ** attempt)
+        retry_after = r.headers.get('Retry-After', '').strip() if r is not None else ''
+        if not retry_after:
+            return backoff
+        try:
+            if retry_after.isdigit():
+                delay = int(retry_after)
+            else:
+                delay = email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return backoff
+        return min(max(0, delay), self.max_delay)
+
+    def get(self, url, **kwargs):
+        host, state = self._host(url)
+        failures = state.open_failures()
+        if failures is not None:
+            raise HostUnavailable(f'{host} failed {failures} times in a row, not requesting {url}')
+
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.retries + 1):
+            r = None
+            error = None
+            state.acquire()
+            try:
+                r = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                state.release()
+
+            failed = error is not None or r.status_code in RETRY_STATUS
+            state.record(not failed, r.elapsed.total_seconds() if r is not None else None, urlsplit(url).path)
+            if not failed:
+                return r
+
+            if r is not None:
+                state.count('throttled')
+            if attempt < self.retries:
+                state.count('retries')
+                if r is not None:
+                    r.close()
+                time.sleep(self._delay(attempt, r))
+
+        state.fail(self.failure_threshold, self.cooldown)
+        if error is not None:
+            raise error
+        r.raise_for_status()
+
+    def stats(self):
+        # per host statistics: requests (including retries), retries, throttled responses, failed requests,
+        # mean latency and the current and lowest concurrency limit
+        result = {}
+        with self._lock:
+            hosts = dict(self._hosts)
+        for host, state in sorted(hosts.items()):
+            with state.condition:
+                stats = dict(state.stats)
+                stats['limit'] = state.limit
+            stats['latency'] = stats['latency'] / stats.pop('measured') if stats['measured'] else 0
+            result[host] = stats
+        return result
+
+    def map(self, fn, items):
+        # applies fn to every item on the worker pool. the result list has the same order as items
+        items = list(items)
+        if self.max_workers == 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            return list(pool.map(fn, items))
@@ -0,0 +1,144 @@
+import datetime
+import json
+import queue
+import signal
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class Daemon:
+    # Calls refresh with the set of parts that are due, each part on its own interval. All parts are refreshed once
+    # on start. Refreshes never overlap: triggers that arrive during a refresh are merged and run afterwards.
+    # If port is set, a http server on localhost accepts immediate refreshes:
+    #   POST /refresh?parts=members,courses   refresh the given parts (all parts if none are given)
+    #   GET /status                           time of the last and next refresh of every part
+    # A failing refresh is reported and retried on the next interval, the daemon keeps running.
+
+    def __init__(self, refresh, intervals, port=None):
+        self.refresh = refresh
+        self.intervals = intervals
+        self.port = port
+        self.running = None
+        self._next = {part: time.monotonic() for part in intervals}
+        self._last = {part: None for part in intervals}
+        self._triggers = queue.Queue()
+        self._stopped = threading.Event()
+
+    def trigger(self, parts=None):
+        # returns the parts that were queued, unknown parts are ignored
+        parts = [part for part in (parts or self.intervals) if part in self.intervals]
+        if parts:
+            self._triggers.put(set(parts))
+        return parts
+
+    def stop(self, *args):
+        self._stopped.set()
+        # wakes up the main loop
+        self._triggers.put(set())
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            'running': sorted(self.running) if self.running else None,
+            'parts': {part: {
+                'interval': interval,
+                'last': self._last[part],
+                'next_in': max(0, round(self._next[part] - now)),
+            } for part, interval in self.intervals.items()},
+        }
+
+    def _handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status, body):
+                content = json.dumps(body, indent=4).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                if urlsplit(self.path).path != '/status':
+                    self._respond(404, {'error': 'not found'})
+                    return
+                self._respond(200, daemon.status())
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                if url.path != '/refresh':
+                    self._respond(404, {'error': 'not found'})
+                    return
+                parts = [part for value in parse_qs(url.query).get('parts', []) for part in value.split(',') if part]
+                queued = daemon.trigger(parts)
+                if not queued:
+                    self._respond(400, {'error': f'unknown parts, expected {", ".join(daemon.intervals)}'})
+                    return
+                self._respond(202, {'queued': queued})
+
+        return Handler
+
+    def _wait(self):
+        # blocks until a part is due or a refresh is triggered, returns the parts to refresh
+        due = set()
+        while not due and not self._stopped.is_set():
+            now = time.monotonic()
+            due = {part for part, at in self._next.items() if at <= now}
+            if due:
+                break
+            try:
+                due = self._triggers.get(timeout=min(self._next.values()) - now)
+            except queue.Empty:
+                pass
+
+        # merge triggers that arrived in the meantime
+        while True:
+            try:
+                due |= self._triggers.get_nowait()
+            except queue.Empty:
+                return due
+
+    def run(self):
+        server = None
+        if self.port:
+            server = ThreadingHTTPServer(('127.0.0.1', self.port), self._handler())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            print(f'Listening for refresh requests on http://127.0.0.1:{self.port}.')
+
+        signal.signal(signal.SIGTERM, self.stop)
+        intervals = ', '.join(f'{part} every {interval}s' for part, interval in self.intervals.items())
+        print(f'Daemon started. Refreshing {intervals}.')
+
+        try:
+            while not self._stopped.is_set():
+                parts = self._wait()
+                if not parts or self._stopped.is_set():
+                    continue
+
+                self.running = parts
+                print(f'[{datetime.datetime.now().isoformat(timespec="seconds")}] '
+                      f'Refreshing {", ".join(sorted(parts))}.')
+                try:
+                    self.refresh(parts)
+                except Exception:
+                    traceback.print_exc()
+                self.running = None
+
+                finished = time.monotonic()
+                for part in parts:
+                    self._next[part] = finished + self.intervals[part]
+                    self._last[part] = datetime.datetime.now().isoformat(timespec='seconds')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if server:
+                server.shutdown()
+                server.server_close()
+            print('Daemon stopped.')
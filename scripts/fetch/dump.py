@@ -0,0 +1,54 @@
+import gzip
+import json
+import os
+import threading
+
+
+class DumpWriter:
+    # Writes records to a gzip compressed NDJSON file (one JSON document per line) as they come in, so a dump never
+    # has to be held in memory as a whole. The file is written next to the target and renamed when the writer is
+    # closed, an aborted run leaves the previous dump intact. Records can be written from several threads, records with
+    # the same key are only written once.
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._tmp_path = f'{path}.{os.getpid()}.tmp'
+        self._file = gzip.open(self._tmp_path, 'wt', encoding='utf-8')
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    def write(self, record, key=None):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock:
+            if key is not None:
+                if key in self._keys:
+                    return
+                self._keys.add(key)
+            self._file.write(line)
+            self.count += 1
+
+    def close(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_dump(path):
+    # yields the records of a dump one by one
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
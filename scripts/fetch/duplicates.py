@@ -0,0 +1,123 @@
+import random
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+
+# MinHash signatures have BANDS * ROWS values. Two titles become a candidate pair if all values of one band match,
+# which happens with probability 1 - (1 - s^ROWS)^BANDS for titles of similarity s (about 0.64 for s = 0.5 and above
+# 0.999 for s = 0.8), so candidates are found without comparing every pair of publications
+BANDS = 16
+ROWS = 4
+SHINGLE_SIZE = 4
+
+# the signature of a title has to be the same in every run, the permutations are therefore seeded
+_PRIME = (1 << 61) - 1
+_random = random.Random(0)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+
+
+def _normalize(text):
+    # lower case ascii letters and digits separated by single spaces
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+def _shingles(title):
+    title = _normalize(title)
+    if len(title) <= SHINGLE_SIZE:
+        return {title}
+    return {title[i:i + SHINGLE_SIZE] for i in range(len(title) - SHINGLE_SIZE + 1)}
+
+
+def _signature(shingles):
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _surnames(post):
+    return {_normalize(name).rsplit(' ', 1)[-1] for name in post['authors']}
+
+
+def _years_match(a, b):
+    # publik dates are not always well formed, publications without a recognizable year are not compared by year
+    years = [re.search(r'\d{4}', post['date']) for post in (a, b)]
+    return not all(years) or abs(int(years[0].group()) - int(years[1].group())) <= 1
+
+
+def _rank(pub_id, post, bib_store):
+    # the record that is kept when duplicates are merged: records with BibTeX first, then the one with most details
+    details = sum(1 for field in ('abstract', 'url_pdf', 'publication') if post.get(field))
+    return bib_store.get(pub_id) is None, -details, post['publication_types'] == ['0'], pub_id
+
+
+def find_duplicates(posts, bib_store, threshold=0.8):
+    # Finds publications that are listed under several ids, e.g. a talk and its proceedings paper. posts is a list of
+    # (pub_id, post) tuples. Candidate pairs are found by locality sensitive hashing of the MinHash signatures of the
+    # titles and confirmed if the titles are similar enough (Jaccard similarity of their shingles), the authors
+    # overlap by at least half and the years are at most one apart.
+    # Returns a list of clusters, each a list of pub_ids starting with the record that should be kept.
+    posts = dict(posts)
+    shingles = {pub_id: _shingles(post['title']) for pub_id, post in posts.items()}
+
+    buckets = defaultdict(list)
+    for pub_id in posts:
+        signature = _signature(shingles[pub_id])
+        for band in range(BANDS):
+            buckets[band, tuple(signature[band * ROWS:(band + 1) * ROWS])].append(pub_id)
+
+    # union-find over the confirmed pairs
+    parents = {}
+
+    def find(pub_id):
+        while parents.get(pub_id, pub_id) != pub_id:
+            pub_id = parents[pub_id]
+        return pub_id
+
+    checked = set()
+    for candidates in buckets.values():
+        for i, first in enumerate(candidates):
+            for second in candidates[i + 1:]:
+                if (first, second) in checked:
+                    continue
+                checked.add((first, second))
+                a, b = posts[first], posts[second]
+                if _jaccard(shingles[first], shingles[second]) >= threshold and \
+                        _jaccard(_surnames(a), _surnames(b)) >= 0.5 and _years_match(a, b):
+                    parents[find(second)] = find(first)
+
+    clusters = defaultdict(list)
+    for pub_id in parents:
+        clusters[find(pub_id)].append(pub_id)
+    for root, cluster in clusters.items():
+        if root not in cluster:
+            cluster.append(root)
+    return sorted((sorted(cluster, key=lambda pub_id: _rank(pub_id, posts[pub_id], bib_store))
+                   for cluster in clusters.values()), key=lambda cluster: cluster[0])
+
+
+def merge_duplicates(posts, clusters):
+    # keeps the first record of every cluster and adds the publik links of the other records to it
+    merged = {pub_id: cluster for cluster in clusters for pub_id in cluster}
+    posts_by_id = dict(posts)
+    result = []
+    for pub_id, post in posts:
+        cluster = merged.get(pub_id)
+        if cluster is None:
+            result.append((pub_id, post))
+        elif cluster[0] == pub_id:
+            for i, duplicate in enumerate(cluster[1:], start=2):
+                for link in posts_by_id[duplicate]['links']:
+                    post['links'].append({**link, 'name': f'{link["name"]} ({i})'})
+            result.append((pub_id, post))
+    return result
+
+
+def report(posts, clusters):
+    posts = dict(posts)
+    return [[{'id': pub_id, 'title': posts[pub_id]['title'], 'authors': posts[pub_id]['authors'],
+              'date': posts[pub_id]['date']} for pub_id in cluster] for cluster in clusters]
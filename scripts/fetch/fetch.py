@@ -2,17 +2,35 @@ import argparse
 import json
 import os
 import re
-from os.path import basename, normpath
+from contextlib import nullcontext
+from os.path import normpath
 
 import bibtexparser
 import requests
 import frontmatter
-import urllib.request
 import shutil
+import sys
 import yaml
-import xmltodict
 import datetime
 
+from bibstore import BibStore, load_database
+from cache import CachingSession, ResponseCache
+from client import FetchExecutor
+from daemon import Daemon
+from dump import DumpWriter, read_dump
+from duplicates import find_duplicates, merge_duplicates, report
+from images import can_encode, find_images, render_derivatives
+from manifest import Manifest
+from profiling import Profiler
+from searchindex import build_index, load_documents
+from xmlstream import iter_records
+
+# make the modules shared with the migrate script importable
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.authors import AuthorResolver, person_id  # noqa: E402
+from common.content import ContentIndex  # noqa: E402
+from common.output import OutputWriter  # noqa: E402
+
 BIG_TID = 4760
 BIG_OID = 18460477
 
@@ -24,12 +42,22 @@ COURSE_URL = TISS_BASE + '/api/course/lecturer/{}'
 PUBLICATION_URL = f'{PUBLIK_BASE}/pubexport.php'
 BIBTEX_URL = f'{PUBLIK_BASE}/pubbibtex.php'
 
+# restricts publik queries to the BIG division. func: 1 -> only fetch publications where the person is actually an
+# author (skip supervisions etc.)
+PUBLIK_SCOPE = {'inst': 'E194', 'abt': '03', 'func': '1'}
+
+CHUNK_SIZE = 64 * 1024
+
+# semesters are identified by year and term, e.g. 2019W. These strings sort chronologically
+SEMESTER_PATTERN = re.compile(r'^\d{4}[SW]$')
+
 
-def _id(name):
-    # might need adjustments in the future, if people with non standard chars in their names join BIG
-    # and those chars are unwanted in the url.
-    return name.lower().replace(' ', '-').replace('ö', 'oe').replace('ä', 'ae').replace('ü', 'ue')\
-        .replace('ß', 'sz').replace(' ', '')
+def _publik_queries(people, bulk=None):
+    # with bulk, the division is queried as a whole. every entry of bulk adds parameters for one request
+    # (e.g. a year range). otherwise one request per person is made
+    if bulk is not None:
+        return [{**PUBLIK_SCOPE, **query} for query in bulk]
+    return [{'zuname': p['last_name'], 'vorname': p['first_name'], **PUBLIK_SCOPE} for p in people]
 
 
 def _get_semesters(at=datetime.datetime.now(), summer_term_start=3, winter_term_start=10):
@@ -58,17 +86,43 @@ def _get_semesters(at=datetime.datetime.now(), summer_term_start=3, winter_term_
     return current, prev
 
 
-def load_courses(lecturers, semester=None, session=requests.Session()):
+def _next_semester(semester):
+    year, term = int(semester[:4]), semester[4]
+    return f'{year}W' if term == 'S' else f'{year + 1}S'
+
+
+def _parse_semesters(spec, current, prev):
+    # parses a comma separated list of semesters and inclusive ranges, e.g. "2015W..current" or "2019W,2020W".
+    # "current" and "previous" can be used instead of a semester. Returns the semesters newest first
+    aliases = {'current': current, 'previous': prev}
+    semesters = set()
+    for part in spec.split(','):
+        bounds = [aliases.get(bound.strip(), bound.strip()) for bound in part.split('..')]
+        if len(bounds) > 2 or not all(SEMESTER_PATTERN.match(bound) for bound in bounds):
+            raise ValueError(f'"{part}" is not a semester or a range of semesters')
+        semester, last = bounds[0], bounds[-1]
+        if semester > last:
+            raise ValueError(f'"{part}" ends before it starts')
+        while semester <= last:
+            semesters.add(semester)
+            semester = _next_semester(semester)
+    return sorted(semesters, reverse=True)
+
+
+def load_courses(lecturers, semester=None, session=requests.Session(), executor=None):
+    return load_semesters(lecturers, [semester], session=session, executor=executor)[semester]
+
+
+def load_semesters(lecturers, semesters, session=requests.Session(), executor=None):
+    # fetches the courses of several semesters. The requests of all semesters share the worker pool, so fetching the
+    # whole teaching history takes about as long as fetching a single semester.
+    # Returns the categorized courses by semester
+    resolver = AuthorResolver(lecturers)
+
     def oids_to_author_ids(oids):
         if type(oids) == str:
             oids = [oids]
-        res = []
-        for oid in oids:
-            ps = [p['identifier'] for p in lecturers if oid == str(p['oid'])]
-            res.extend(ps)
-        return res
-
-    course_dict = {}
+        return [author_id for author_id in map(resolver.resolve_oid, oids) if author_id]
 
     namespaces = {
       f'{TISS_BASE}/api/schemas/course/v10': None,
@@ -76,59 +130,65 @@ def load_courses(lecturers, semester=None, session=requests.Session()):
       f'{TISS_BASE}/api/schemas/i18n/v10': None
     }
 
-    for lect in lecturers:
+    def fetch(job):
+        semester, lect = job
         url = COURSE_URL.format(lect['oid'])
         query = {}
         if session:
             query['semester'] = semester
-        r = session.get(url, params=query)
-        xml_dict = xmltodict.parse(r.content, encoding='utf-8', process_namespaces=True, namespaces=namespaces)
-
-        # skip invalid users
-        if 'tuvienna' not in xml_dict:
-            continue
-        parse_res = xml_dict['tuvienna']
-        # skip users that are not associated to any courses
-        if 'course' not in parse_res:
-            continue
+        r = executor.get(url, params=query)
 
-        for course in parse_res['course']:
-            # skip cases where xml deserialization oddly does not generate a dict
+        # invalid users do not return a tuvienna document, users without courses return one without course elements
+        courses = []
+        for course in iter_records(r.iter_content(CHUNK_SIZE), 'course', root='tuvienna', encoding='utf-8',
+                                   namespaces=namespaces):
+            # skip course elements without content
             if not isinstance(course, dict):
                 continue
             course_id = f'{course["courseNumber"]}-{course["semesterCode"]}'
+            courses.append((course_id, {
+                'authors': sorted(oids_to_author_ids(course['lecturers']['oid'])),
+                'number': course["courseNumber"],
+                'url': course["url"],
+                'type': course["courseType"],
+                'title': course["title"]["en"]
+            }))
+        return courses
+
+    executor = executor or FetchExecutor(session)
+
+    jobs = [(semester, lect) for semester in semesters for lect in lecturers]
+    course_dicts = {semester: {} for semester in semesters}
+
+    # responses are processed in lecturer order, so the first lecturer listing a course wins as in a sequential run
+    for (semester, _), courses in zip(jobs, executor.map(fetch, jobs)):
+        course_dict = course_dicts[semester]
+        for course_id, course in courses:
             # skip duplicates
             if course_id in course_dict:
                 continue
-            course_dict[course_id] = dict(course)
-
-    courses = list(course_dict.values())
+            course_dict[course_id] = course
 
     lecture_exercise_course_types = ['VO', 'VU']
     seminar_project_course_types = ['SE', 'PV', 'PR']
 
-    lectures_exercises = [c for c in courses if c['courseType'] in lecture_exercise_course_types]
-    seminars_projects = [c for c in courses if c['courseType'] in seminar_project_course_types]
-    other = [c for c in courses if c['courseType'] not in
-             (lecture_exercise_course_types + seminar_project_course_types)]
-
-    result = {}
-
-    for identifier, courses in [('lectures_exercises', lectures_exercises),
-                                ('seminars_projects', seminars_projects),
-                                ('other', other)]:
-        result[identifier] = [{
-            'authors': sorted(oids_to_author_ids(course['lecturers']['oid'])),
-            'number': course["courseNumber"],
-            'url': course["url"],
-            'type': course["courseType"],
-            'title': course["title"]["en"]
-        } for course in courses]
-
-    return result
-
-
-def load_publications(researchers, bib_db, author_transform_map, session=requests.Session()):
+    results = {}
+    for semester, course_dict in course_dicts.items():
+        courses = list(course_dict.values())
+        results[semester] = {
+            'lectures_exercises': [c for c in courses if c['type'] in lecture_exercise_course_types],
+            'seminars_projects': [c for c in courses if c['type'] in seminar_project_course_types],
+            'other': [c for c in courses if c['type'] not in
+                      (lecture_exercise_course_types + seminar_project_course_types)]
+        }
+    return results
+
+
+def load_publications(researchers, bib_store, resolver, session=requests.Session(), executor=None,
+                      bulk=None, dump=None, records=None, empty=None):
+    # Returns a list of (pub_id, post) tuples. Author names are written as resolver (an AuthorResolver) resolves them.
+    # The raw records of all kept publications are written to dump (a DumpWriter) as they are parsed. records replays
+    # raw records of a dump instead of fetching them from publik. Queries that returned no records are appended to empty
     # this map is used to map the given type of a pub record (key) to the respective element for further information
     type_map = {
         'Herausgabe eines Bandes einer Buchreihe': 'herausgabe_buchreihe',
@@ -179,40 +239,28 @@ def load_publications(researchers, bib_db, author_transform_map, session=request
       'patent': 8
     }
 
-    publications = []
     posts = []
 
-    for res in researchers:
-        # func: 1 -> only fetch publications where the person is actually an author (skip supervisions etc.)
-        query = {'zuname': res['last_name'], 'vorname': res['first_name'],
-                 'inst': 'E194', 'abt': '03', 'func': '1', 'lang': '2'}
-        r = session.get(PUBLICATION_URL, params=query)
-        content = r.content.decode('ISO-8859-1')
-        xml = xmltodict.parse(content, encoding='utf-8')['export']  # get root element
-        if 'publikation' not in xml:
-            continue
-        result = xml['publikation'] if type(xml['publikation']) == list else [xml['publikation']]
-        publications.extend(result)
+    def author_names(pub):
+        # names of the authors as listed by publik
+        authors = pub['autor_info'] if ',' in pub['autoren_clean'] else [pub['autor_info']]
+        return [f'{a["vorname_lang"]} {a["nachname"]}' for a in authors]
 
-    for pub in publications:
+    def to_post(pub):
         pub_id = pub['pub_id'].lower()
         pub_type = pub['type']
 
-        if pub_type in type_map:
-            pub_type = type_map[pub_type]
-        else:
-            # if this error occurs, there is not mapping for the given pub_type in the dicts above.
-            print(f'Skipping publication "{pub_id}" due to unknown pub-type: {pub_type}.')
-            continue
+        # unknown publication types are reported and skipped by the caller
+        if pub_type not in type_map:
+            return None
+        pub_type = type_map[pub_type]
 
         # get abstract and strip all <br> tags
         abstract = pub['abstract_englisch'] if 'abstract_englisch' in pub else ''
         abstract = re.sub('<br/?>', '', abstract)
         # remove all dots from title (intention is to remove trailing dots)
         title = pub['titel'].strip('.')
-        authors = pub['autor_info'] if ',' in pub['autoren_clean'] else [pub['autor_info']]
-        authors = [f'{a["vorname_lang"]} {a["nachname"]}' for a in authors]
-        authors = [author_transform_map[name] if name in author_transform_map else name for name in authors]
+        authors = [resolver.canonical(name) for name in author_names(pub)]
         pdf_link = pub['link_pdf'] if 'link_pdf' in pub else ''
         publik_link = pub['infolink']
 
@@ -229,11 +277,7 @@ def load_publications(researchers, bib_db, author_transform_map, session=request
         elif 'jahr' in pub[pub_type]:
             year = pub[pub_type]['jahr']
 
-        bib_entry = None
-        for entry in bib_db.entries:
-            if entry['ID'].lower() == pub_id:
-                bib_entry = entry
-                break
+        bib_entry = bib_store.get(pub_id)
         academic_type = academic_type_map.get(bib_entry["ENTRYTYPE"], 0) if bib_entry else 0
 
         # type specific content
@@ -250,31 +294,802 @@ def load_publications(researchers, bib_db, author_transform_map, session=request
                                 abstract=abstract, featured=False, url_pdf=pdf_link, publication=extra,
                                 links=[{'name': 'Publik', 'url': publik_link}])
 
-        posts.append((pub_id, post))
-
-    return publications, posts
+        return post
+
+    def whitelisted(pub):
+        # a bulk query returns the whole division, only publications of whitelisted authors are kept (including the ones
+        # of unknown types, they are reported below). Initials are not matched here, external co-authors may share the
+        # initials and last name of a person
+        return researcher_ids.intersection(resolver.resolve(name, initials=False) for name in author_names(pub))
+
+    def fetch(query, whitelist=False):
+        r = executor.get(PUBLICATION_URL, params={**query, 'lang': '2'})
+
+        # records are filtered, dumped and converted as soon as they are parsed, raw records are not kept.
+        # Returns the number of returned records and the converted ones
+        count = 0
+        converted = []
+        for pub in iter_records(r.iter_content(CHUNK_SIZE), 'publikation', root='export', encoding='ISO-8859-1'):
+            count += 1
+            if not whitelist or whitelisted(pub):
+                converted.append(convert(pub))
+        if not count and empty is not None:
+            empty.append(query)
+        return count, converted
+
+    def convert(pub):
+        pub_id = pub['pub_id'].lower()
+        if dump:
+            # co-authored publications are returned once per author, but only dumped once
+            dump.write(pub, key=pub_id)
+        return pub_id, pub['type'], to_post(pub)
+
+    executor = executor or FetchExecutor(session)
+    researcher_ids = set(r['identifier'] for r in researchers)
+    seen = set()
+
+    if records is not None:
+        # dumped records were already filtered
+        results = [(None, (convert(pub) for pub in records))]
+    else:
+        results = executor.map(lambda query: fetch(query, whitelist=bulk is not None),
+                               _publik_queries(researchers, bulk))
+        if bulk is not None and not any(count for count, _ in results):
+            print('Bulk query did not return any publications. Fetching publications per person.')
+            if empty is not None:
+                empty.clear()
+            results = executor.map(fetch, _publik_queries(researchers))
+
+    for _, batch in results:
+        for pub_id, pub_type, post in batch:
+            # co-authored publications are returned once per author
+            if pub_id in seen:
+                continue
+            seen.add(pub_id)
+            if post is None:
+                # if this error occurs, there is not mapping for the given pub_type in the dicts above.
+                print(f'Skipping publication "{pub_id}" due to unknown pub-type: {pub_type}.')
+                continue
+            posts.append((pub_id, post))
 
+    return posts
 
-def load_bibtex(publishers, session=requests.Session()):
-    bibtex = ''
 
-    for pub in publishers:
-        query = {'zuname': pub['last_name'], 'vorname': pub['first_name'], 'inst': 'E194', 'abt': '03', 'func': '1'}
-        r = session.get(BIBTEX_URL, params=query)
+def load_bibtex(publishers, session=requests.Session(), executor=None, bulk=None, max_workers=None, memo=None,
+                dump=None, texts=None):
+    # The BibTeX export of every query is written to dump (a DumpWriter) if given, texts replays the exports of a
+    # dump instead of fetching them from publik
+    def fetch(query):
+        r = executor.get(BIBTEX_URL, params=query)
         result = r.content.decode('ISO-8859-1')
-        for line in result.split(os.linesep):
-            if len(line) == 0 or line.startswith('BibTeX-Export:') or \
-              line.endswith('ausgegeben') or line.startswith('@comment'):
+        lines = [line for line in result.split(os.linesep)
+                 if not (len(line) == 0 or line.startswith('BibTeX-Export:') or
+                         line.endswith('ausgegeben') or line.startswith('@comment'))]
+        return '\n'.join(lines) + '\n'
+
+    executor = executor or FetchExecutor(session)
+
+    if texts is not None:
+        results = list(texts)
+    else:
+        results = executor.map(fetch, _publik_queries(publishers, bulk))
+        if bulk is not None and not any('@' in result for result in results):
+            print('Bulk query did not return any BibTeX records. Fetching BibTeX records per person.')
+            results = executor.map(fetch, _publik_queries(publishers))
+    if dump:
+        for result in results:
+            dump.write(result)
+
+    # the daemon passes the same memo on every refresh, unchanged records are not parsed again
+    key = Manifest.digest(*results)
+    if memo is not None and memo.get('key') == key:
+        return memo['store']
+
+    bib_database = load_database(results, max_workers=max_workers)
+    bib_store = BibStore(bib_database)
+
+    if memo is not None:
+        memo['key'] = key
+        memo['store'] = bib_store
+    return bib_store
+
+
+def sync_publications(posts, bib_store, content, manifest, writer, override=False, prune=None, listed=(),
+                      resolver=None, merged=None):
+    # writes the posts to the publication directory. Records whose rendered files match the hash stored in the
+    # manifest are not touched. Without override, existing directories are never written to.
+    # prune is the set of ids of the people whose publications were fetched. Publications that were created by a
+    # previous run but are no longer returned by publik are removed if one of their authors (mapped to ids by resolver)
+    # is in prune, so publications of people who were not fetched in this run are kept. listed are all ids returned by
+    # publik, including the ones merged into other publications, they are never pruned.
+    # merged maps the ids of duplicates to the id of the publication they were merged into. Their directories (e.g.
+    # written before merging was enabled) are removed if they were created by a previous run or with override.
+    # content is the ContentIndex of the content directory, existing publications are looked up in it
+    counts = {'added': 0, 'changed': 0, 'unchanged': 0, 'skipped': 0, 'removed': 0}
+    seen = set()
+    publication_dir = f'{content.content_dir}/publication'
+
+    for identifier, post in posts:
+        # co-authored publications are listed once per author
+        if identifier in seen:
+            continue
+        seen.add(identifier)
+
+        directory = f'{publication_dir}/{identifier}'
+        exists = content.exists(f'{directory}/index.md')
+        if exists and not override:
+            counts['skipped'] += 1
+            continue
+
+        bibtex = None
+        bib_entry = bib_store.get(identifier)
+        if bib_entry:
+            db = bibtexparser.bibdatabase.BibDatabase()
+            db.entries = [bib_entry]
+            bibtex = bibtexparser.bwriter.BibTexWriter().write(db)
+        index = frontmatter.dumps(post)
+
+        digest = Manifest.digest(index, bibtex)
+        if exists and manifest.unchanged(identifier, digest):
+            counts['unchanged'] += 1
+            continue
+
+        os.makedirs(directory, exist_ok=True)
+        changed = False
+        if bibtex is not None:
+            changed |= writer.write(f'{directory}/cite.bib', bibtex)
+        elif content.exists(f'{directory}/cite.bib'):
+            os.remove(f'{directory}/cite.bib')
+            changed = True
+        changed |= writer.write(f'{directory}/index.md', index)
+
+        manifest.update(identifier, digest)
+        if not exists:
+            counts['added'] += 1
+        elif changed:
+            counts['changed'] += 1
+        else:
+            counts['unchanged'] += 1
+
+    for identifier, target in sorted((merged or {}).items()):
+        directory = f'{publication_dir}/{identifier}'
+        if identifier in seen or not content.exists(f'{directory}/index.md'):
+            continue
+        if identifier not in manifest.entries and not override:
+            print(f'Publication "{identifier}" was merged into "{target}", but was not created by this script. '
+                  f'Remove "{directory}" or run with "-o" to remove it.')
+            continue
+        print(f'Removing publication "{identifier}" merged into "{target}".')
+        shutil.rmtree(directory)
+        manifest.remove(identifier)
+        counts['removed'] += 1
+
+    if prune:
+        # only records tracked by the manifest are removed, manually created publications are never touched
+        for identifier in sorted(set(manifest.entries) - seen - set(listed)):
+            directory = f'{publication_dir}/{identifier}'
+            post = content.metadata(f'{directory}/index.md')
+            authors = set(resolver.resolve(name) for name in post.get('authors') or []) if post is not None else prune
+            if not prune.intersection(authors):
+                continue
+            if os.path.exists(directory):
+                print(f'Removing withdrawn publication "{identifier}".')
+                shutil.rmtree(directory)
+            manifest.remove(identifier)
+            counts['removed'] += 1
+
+    manifest.save()
+    return counts
+
+
+def sync_avatars(avatars, default_avatar, executor, validators, writer, download=True):
+    # avatars is a list of (url, destination) tuples. Pictures are streamed to disk through the shared session and
+    # requested conditionally, so an unchanged picture is neither transferred nor written. Without validators (e.g. on
+    # the first run) pictures are downloaded to a temporary file and only replace the destination if they differ.
+    # validators maps picture urls to the ETag/Last-Modified headers of the last download and is updated in place.
+    # People without a picture get the default avatar, but only if they do not have one yet.
+    counts = {'downloaded': 0, 'unchanged': 0, 'default': 0}
+
+    def fetch(avatar):
+        url, dest = avatar
+        headers = {}
+        known = validators.get(url, {}) if os.path.exists(dest) else {}
+        if 'ETag' in known:
+            headers['If-None-Match'] = known['ETag']
+        if 'Last-Modified' in known:
+            headers['If-Modified-Since'] = known['Last-Modified']
+
+        with executor.get(url, headers=headers, stream=True) as r:
+            if r.status_code == 304:
+                return 'unchanged', known
+            r.raise_for_status()
+
+            tmp_dest = f'{dest}.tmp'
+            try:
+                with open(tmp_dest, 'wb') as f:
+                    for chunk in r.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                changed = writer.copy(tmp_dest, dest)
+            finally:
+                if os.path.exists(tmp_dest):
+                    os.remove(tmp_dest)
+            headers = {h: r.headers[h] for h in ('ETag', 'Last-Modified') if h in r.headers}
+            return 'downloaded' if changed else 'unchanged', headers
+
+    downloads = []
+    for url, dest in avatars:
+        if url and download:
+            downloads.append((url, dest))
+        elif not os.path.exists(dest):
+            shutil.copyfile(default_avatar, dest)
+            counts['default'] += 1
+
+    for (url, _), (status, headers) in zip(downloads, executor.map(fetch, downloads)):
+        counts[status] += 1
+        validators[url] = headers
+
+    return counts
+
+
+def sync_people(people, people_dir, template_dir, writer, override=False):
+    # applies data from TISS to profiles (and creates new pages). Returns the (url, destination) tuples of the
+    # profile pics of all written profiles, as pics are downloaded together afterwards
+    avatars = []
+    for person in people:
+        first_name = person['first_name']
+        last_name = person['last_name']
+        name = f'{first_name} {last_name}'
+        directory = f'{people_dir}/{person["identifier"]}'
+        template_source = template_dir + '/authors/user/_index.md'
+
+        # create folder
+        if not os.path.exists(directory):
+            # dir does not exist
+            print(f'Creating author files for {name}.')
+            os.makedirs(directory)
+        elif not override:
+            # dir does exist, but override is disabled
+            continue
+        else:
+            # dir does exist
+            template_source = directory + '/_index.md'
+
+        # profile pics are downloaded together once all profiles are written
+        pic_url = TISS_BASE + person['picture_uri'] if person['picture_uri'] else None
+        avatars.append((pic_url, directory + '/avatar.jpg'))
+
+        # apply metadata to markdown front matter
+        post = frontmatter.load(template_source)
+
+        pairs = []
+        if 'pairs' in post:
+            pairs = post['pairs']
+
+        email = person["main_email"]
+        big_mails = list(filter(lambda mail: '@big.tuwien.ac.at' in mail, person['other_emails']))
+        if len(big_mails) > 0:
+            email = big_mails[0]
+
+        mail_pair = {'key': 'Mail', 'value': email, 'link': f'mailto:{email}'}
+
+        phone = person['main_phone_number']
+        phone_pair = None
+        if phone:
+            phone_pair = {'key': 'Phone', 'value': phone, 'link': f'tel:{phone}'}
+
+        room_pair = None
+        if 'room_code' in person:
+            room = person['room_code']
+            room_pair = {'key': 'Location', 'value': room}
+
+        # get remaining pairs that might have been defined individually such as office hours
+        remaining_pairs = list(filter(
+            lambda p: 'key' not in p or (p['key'] != 'Mail' and p['key'] != 'Phone' and p['key'] != 'Location'),
+            pairs
+        ))
+
+        pairs = [mail_pair]
+        if phone_pair:
+            pairs.append(phone_pair)
+        if room_pair:
+            pairs.append(room_pair)
+        pairs.extend(remaining_pairs)
+
+        post['name'] = name
+        post['email'] = email
+        post['authors'] = [person["identifier"]]
+        post['role'] = person['preceding_titles']
+        post['pairs'] = pairs
+
+        writer.write(f'{directory}/_index.md', frontmatter.dumps(post))
+
+    return avatars
+
+
+def sync_groups(content, id_grouped_people, default_group, writer):
+    # sets the group of every existing profile, profiles that are not listed in the group config get the default group.
+    # The current groups are read from the content index, only profiles whose group changes are loaded and written
+    for folder_id in content.ids('people'):
+        group = id_grouped_people.get(folder_id, default_group)
+
+        index_file = f'{content.content_dir}/people/{folder_id}/_index.md'
+        metadata = content.metadata(index_file)
+        if metadata is None:
+            continue
+        if metadata.get('user_groups') == [group]:
+            writer.skip()
+            continue
+        post = frontmatter.load(index_file)
+        post['user_groups'] = [group]
+        writer.write(index_file, frontmatter.dumps(post))
+
+
+def load_profile_resolver(content, transform=None, people=()):
+    # returns an AuthorResolver of people (TISS records) and all existing profiles, used to link authors to their
+    # profile. Profiles of people who are not in people (e.g. former members) are matched by the name of the profile
+    resolver = AuthorResolver(people, transform)
+    for profile_id in content.ids('people'):
+        if profile_id in resolver:
+            continue
+        post = content.metadata(f'{content.content_dir}/people/{profile_id}/_index.md')
+        if post is not None:
+            resolver.add_profile(profile_id, post.get('name') or profile_id)
+    return resolver
+
+
+def sync_author_index(content, resolver, data_dir, writer):
+    # Writes data/authors.json, which maps the id of every profile to its name, profile url, publication ids and course
+    # numbers by semester. Templates look authors up in this file (layouts/partials/functions/get_author.html) instead
+    # of resolving the profile page of every author of every page, the profile page (layouts/people/list.html) lists
+    # publications and courses of the person from it. The index is built from the front matter of the profiles and
+    # publications in the content index and the course files, so it is complete no matter which parts were fetched in
+    # this run. resolver (an AuthorResolver) maps the author names of the publications to profiles. Returns the index
+    authors = {}
+    for profile_id in content.ids('people'):
+        post = content.metadata(f'{content.content_dir}/people/{profile_id}/_index.md')
+        if post is None:
+            continue
+        authors[profile_id] = {'name': post.get('name') or profile_id, 'url': f'/people/{profile_id}/',
+                               'publications': [], 'courses': {}}
+
+    for publication_id in content.ids('publication'):
+        post = content.metadata(f'{content.content_dir}/publication/{publication_id}/index.md')
+        if post is None or post.get('draft'):
+            continue
+        for author_id in sorted(set(resolver.resolve(name) for name in post.get('authors') or []) - {None}):
+            if author_id in authors:
+                authors[author_id]['publications'].append(publication_id)
+
+    course_dir = f'{data_dir}/teaching/courses'
+    if os.path.exists(course_dir):
+        for semester in sorted((f.name[:-5] for f in os.scandir(course_dir)
+                                if f.name.endswith('.json') and SEMESTER_PATTERN.match(f.name[:-5])), reverse=True):
+            with open(f'{course_dir}/{semester}.json', 'r', encoding='utf-8') as f:
+                courses = json.load(f)
+            for course in (c for category in courses.values() for c in category):
+                for author_id in course['authors']:
+                    if author_id not in authors:
+                        continue
+                    numbers = authors[author_id]['courses'].setdefault(semester, [])
+                    if course['number'] not in numbers:
+                        numbers.append(course['number'])
+
+    writer.write(f'{data_dir}/authors.json', json.dumps(authors, ensure_ascii=False, separators=(',', ':')) + '\n')
+    return authors
+
+
+def sync_publication_buckets(content, resolver, data_dir, static_dir, authors, writer):
+    # Writes the publication list split into buckets per year (static/publication-buckets/year-<year>.json) and per
+    # publication type (type-<type>.json). The publication section only renders the newest year, older years and
+    # filtered types are loaded from the buckets by assets/js/publication-buckets.js. data/publication_buckets.json
+    # lists the available buckets for the template. authors is the author index, used with resolver to link the
+    # profiles, the front matter of the publications is read from the content index. Returns the number of publications
+    bucket_dir = f'{static_dir}/publication-buckets'
+    os.makedirs(bucket_dir, exist_ok=True)
+
+    buckets = {}
+    years = {}
+    types = {}
+    for publication_id in content.ids('publication'):
+        post = content.metadata(f'{content.content_dir}/publication/{publication_id}/index.md')
+        if post is None or post.get('draft'):
+            continue
+
+        # dates of some publik records are not well formed, they are listed under the first year they contain
+        date = str(post.get('date') or '')
+        if not re.match(r'\d{4}-\d{2}-\d{2}', date):
+            year = re.search(r'\d{4}', date)
+            date = f'{year.group() if year else "0001"}-01-01'
+        year = date[:4]
+        pub_type = int((post.get('publication_types') or ['0'])[0])
+
+        names = []
+        for name in post.get('authors') or []:
+            author = authors.get(resolver.resolve(name))
+            names.append([author['name'], author['url']] if author else [name])
+        links = [[link['name'], link['url']] for link in post.get('links') or [] if link.get('url')]
+        if post.get('url_pdf'):
+            links.insert(0, ['PDF', post['url_pdf']])
+
+        record = {'title': post.get('title') or '', 'url': f'/publication/{publication_id}/', 'date': date[:10],
+                  'type': pub_type, 'authors': names, 'publication': post.get('publication') or '', 'links': links}
+        buckets.setdefault(f'year-{year}', []).append(record)
+        buckets.setdefault(f'type-{pub_type}', []).append(record)
+        years[year] = years.get(year, 0) + 1
+        types[pub_type] = types.get(pub_type, 0) + 1
+
+    for name, records in buckets.items():
+        records.sort(key=lambda record: (record['date'], record['url']), reverse=True)
+        writer.write(f'{bucket_dir}/{name}.json', json.dumps(records, ensure_ascii=False, separators=(',', ':')))
+    for bucket in os.scandir(bucket_dir):
+        if bucket.name.endswith('.json') and bucket.name[:-5] not in buckets:
+            os.remove(bucket.path)
+
+    index = {
+        # appended to the bucket urls, so browsers do not use outdated buckets
+        'version': Manifest.digest(*(json.dumps(buckets[name], sort_keys=True) for name in sorted(buckets)))[:12],
+        'years': [{'year': year, 'count': years[year]} for year in sorted(years, reverse=True)],
+        'types': [{'type': pub_type, 'count': types[pub_type]} for pub_type in sorted(types)],
+    }
+    writer.write(f'{data_dir}/publication_buckets.json', json.dumps(index, indent=2) + '\n')
+    return sum(years.values())
+
+
+def sync_search_index(content_dir, data_dir, static_dir, writer):
+    # Writes the search index of the site to static/search: docs.json lists the indexed pages and the shards in
+    # static/search/shards hold the posting lists of all terms starting with the same characters. The search script
+    # (assets/js/academic-search.js) only downloads the shards of the query terms instead of the whole index.json.
+    # data/search_index.json holds the version of the index, which the page head passes to the search script so
+    # docs.json is not served from the browser cache after a deploy.
+    # Like the author index, it is built from the files on disk. Returns the number of indexed pages
+    search_dir = f'{static_dir}/search'
+    shard_dir = f'{search_dir}/shards'
+    os.makedirs(shard_dir, exist_ok=True)
+
+    docs, shards, version = build_index(load_documents(content_dir))
+    for prefix, terms in shards.items():
+        writer.write(f'{shard_dir}/{prefix}.json', json.dumps(terms, ensure_ascii=False, separators=(',', ':')))
+    for shard in os.scandir(shard_dir):
+        if shard.name.endswith('.json') and shard.name[:-5] not in shards:
+            os.remove(shard.path)
+
+    writer.write(f'{search_dir}/docs.json', json.dumps({'version': version, 'docs': docs}, ensure_ascii=False,
+                                                       separators=(',', ':')))
+    writer.write(f'{data_dir}/search_index.json', json.dumps({'version': version}) + '\n')
+    return len(docs)
+
+
+def sync_images(content_dir, static_dir, cache_dir, writer, max_workers=None):
+    # Writes WebP and resized derivatives of the avatars and featured images of the pages to static/derived (see
+    # images.py), the templates use them instead of resizing the originals with hugo
+    # (layouts/partials/functions/get_image.html).
+    # Encoded derivatives are kept in the cache, so only new or changed images are encoded.
+    # Returns (number of images, number of encoded files)
+    derived_dir = f'{static_dir}/derived'
+    images = list(find_images(content_dir, derived_dir))
+    derivatives, encoded = render_derivatives(images, f'{cache_dir}/images', max_workers=max_workers)
+
+    paths = set()
+    for cached, path in derivatives:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        writer.copy(cached, path)
+        paths.add(normpath(path))
+    for root, dirs, files in os.walk(derived_dir, topdown=False):
+        for name in files:
+            if normpath(f'{root}/{name}') not in paths:
+                os.remove(f'{root}/{name}')
+        if not os.listdir(root):
+            os.rmdir(root)
+    return len(images), encoded
+
+
+def load_config(args, state):
+    # reads the config and the group config into state. Files that were not modified since they were read last are
+    # not read again, so the daemon picks up changes without restarting
+    for key, path, name in (('config', args.config_path, 'config file'),
+                            ('group_config', args.group_config_path, 'group config file')):
+        try:
+            mtime = os.path.getmtime(path)
+            if state.get(key) is not None and state[key + '_mtime'] == mtime:
                 continue
-            bibtex += line + '\n'
-        bibtex += '\n'
+            with open(path, 'r', encoding='utf-8') as yml:
+                state[key] = yaml.safe_load(yml)
+            state[key + '_mtime'] = mtime
+        except Exception as e:
+            print(f'Cannot read {name}: ', e)
+            return False
+    return True
+
+
+def sync(args, state, members=False, courses=False, publications=False):
+    # Fetches the selected parts and updates the content and data directories. state holds everything that is kept
+    # between the refreshes of the daemon: session and executor (warm connections), the configs, the TISS records of
+    # the last member refresh, the publication manifest, the parsed BibTeX records and the content index.
+    # Returns False if the refresh could not be started
+    if not load_config(args, state):
+        return False
+    config = state['config']
+    group_config = state['group_config']
+    s = state['session']
+    executor = state['executor']
 
-    parser = bibtexparser.bparser.BibTexParser(common_strings=True)
-    parser.customization = bibtexparser.customization.convert_to_unicode
-    parser.ignore_nonstandard_types = False
-    bib_database = bibtexparser.loads(bibtex_str=bibtex, parser=parser)
+    base_dir = args.base_path.rstrip('/')
+    data_dir = base_dir + '/data'
+    content_dir = base_dir + '/content'
+    people_dir = content_dir + '/people'
 
-    return bib_database
+    template_dir = 'templates'
+
+    # front matter of the content files, parsed front matter is kept in the cache between runs
+    if 'content' not in state:
+        state['content'] = ContentIndex(content_dir, None if args.no_cache else f'{args.cache_dir}/content.pickle')
+    content = state['content']
+    parsed = content.parsed
+
+    writer = OutputWriter()
+    profiler = Profiler(writer, cprofile=bool(args.profile_stats_path))
+    if args.profile_path:
+        profiler.attach(s)
+    try:
+        cache_stats = None if args.no_cache else dict(s.stats)
+        host_stats = executor.stats()
+
+        # with from_dump, the records of the debug dumps are used and nothing is requested
+        dump_dir = args.dump_dir.rstrip('/')
+        debug = args.debug and not args.from_dump
+        if debug:
+            os.makedirs(dump_dir, exist_ok=True)
+
+        # fetch members. Courses and publications reuse the records of the last member refresh, building only the site
+        # index does not need them
+        if members or (state.get('employees') is None and (courses or publications)):
+            with profiler.stage('people') as stage:
+                if args.from_dump:
+                    state['employees'] = list(read_dump(f'{dump_dir}/people.ndjson.gz'))
+                else:
+                    r = executor.get(PEOPLE_URL)
+                    data = r.json()
+                    state['employees'] = data['employees']
+                stage['records'] = len(state['employees'])
+
+            if debug:
+                with DumpWriter(f'{dump_dir}/people.ndjson.gz') as dump:
+                    for person in state['employees']:
+                        dump.write(person)
+
+            # add identifiers
+            for person in state['employees']:
+                person['identifier'] = person_id(person['first_name'] + ' ' + person['last_name'])
+
+        # apply whitelist
+        print('Applying whitelist based on group config.')
+
+        groups = group_config['groups']
+        name_grouped_people = {}
+        for group_name, group_members in groups.items():
+            for name in group_members:
+                if name not in name_grouped_people:
+                    name_grouped_people[name] = group_name
+        id_grouped_people = dict((person_id(k), v) for k, v in name_grouped_people.items())
+
+        tiss_employees = [p for p in state.get('employees') or [] if p['identifier'] in id_grouped_people.keys()]
+
+        if members:
+            print('Fetching people. Creating files for new people in the "content/authors" directory.')
+
+            # apply data from TISS to profiles (and create new pages)
+            # only profiles listed in the group config will be handled
+            with profiler.stage('profiles') as stage:
+                avatars = sync_people(tiss_employees, people_dir, template_dir, writer, override=args.override)
+                stage['records'] = len(avatars)
+
+            # download profile pics or copy default
+            validator_path = f'{args.cache_dir}/avatars.json'
+            validators = {}
+            if not args.no_cache and os.path.exists(validator_path):
+                with open(validator_path, 'r', encoding='utf-8') as f:
+                    validators = json.load(f)
+
+            with profiler.stage('avatars') as stage:
+                counts = sync_avatars(avatars, template_dir + '/authors/user/avatar.jpg', executor, validators, writer,
+                                      download=not (args.offline or args.from_dump))
+                stage['records'] = len(avatars)
+            print(f'Avatars: {counts["downloaded"]} downloaded, {counts["unchanged"]} unchanged, '
+                  f'{counts["default"]} default.')
+
+            if not args.no_cache:
+                os.makedirs(args.cache_dir, exist_ok=True)
+                writer.write(validator_path, json.dumps(validators, indent=4))
+
+            # adjust groups for all profiles
+            with profiler.stage('groups'):
+                content.refresh()
+                sync_groups(content, id_grouped_people, group_config['default'], writer)
+
+        if courses and args.from_dump:
+            print('Skipping courses as they are not part of the debug dumps.')
+        elif courses:
+            # fetch courses. has to be done separately for each person
+            # as fetching courses for the institute returns an empty set
+            print('Fetching courses. Creating files for courses in the "content/teaching" directory.')
+
+            # the semester changes while the daemon is running
+            current_semester, prev_semester = _get_semesters(at=datetime.datetime.now())
+            semesters = _parse_semesters(args.semesters, current_semester, prev_semester)
+
+            lecturer_blacklist = [person_id(name) for name in config['courses']['blacklist']]
+            lecturers = [p for p in tiss_employees if p['identifier'] not in lecturer_blacklist]
+
+            course_dir = f'{data_dir}/teaching/courses'
+            os.makedirs(course_dir, exist_ok=True)
+
+            # courses of finished semesters do not change anymore. Once they were fetched after the end of the semester,
+            # they are archived and never fetched again
+            archive_path = f'{course_dir}/archive.json'
+            archive = []
+            if os.path.exists(archive_path):
+                with open(archive_path, 'r', encoding='utf-8') as f:
+                    archive = json.load(f)
+
+            if not args.refresh_archive:
+                archived = [sem for sem in semesters if sem in archive and os.path.exists(f'{course_dir}/{sem}.json')]
+                if archived:
+                    print(f'Skipping archived semesters {", ".join(archived)}. '
+                          f'Run with "--refresh-archive" to fetch them.')
+                semesters = [sem for sem in semesters if sem not in archived]
+
+            if semesters:
+                print(f'Fetching courses for semesters {", ".join(semesters)}.')
+            with profiler.stage('courses') as stage:
+                semester_courses = load_semesters(lecturers, semesters, session=s, executor=executor)
+                stage['records'] = sum(len(c) for courses in semester_courses.values() for c in courses.values())
+
+                for semester, courses in semester_courses.items():
+                    writer.write(f'{course_dir}/{semester}.json', json.dumps(courses, indent=4))
+
+            archive = sorted(set(archive).union(sem for sem in semesters if sem < current_semester), reverse=True)
+            writer.write(archive_path, json.dumps(archive, indent=2) + '\n')
+
+            # the course widget picks semesters by their index in this list, newest first. So element 0 is the current
+            # and element 1 the previous semester
+            available = sorted((f.name[:-5] for f in os.scandir(course_dir)
+                                if f.name.endswith('.json') and SEMESTER_PATTERN.match(f.name[:-5])), reverse=True)
+            writer.write(f'{course_dir}/semesters.json', json.dumps(available, indent=2) + '\n')
+
+        if publications:
+            # fetch publications
+
+            # right now publications are fetched based on the people records in TISS. If there is no TISS record
+            # in the BIG org unit for this person, no publications will be loaded.
+            # If required, this step can be skipped by splitting the names from the config into first and last name.
+            # (edge case: people with multiple first names)
+
+            publisher_blacklist = [person_id(name) for name in config['publications']['blacklist']]
+            publishers = [p for p in tiss_employees if p['identifier'] not in publisher_blacklist]
+
+            bulk = None
+            bulk_config = config['publications'].get('bulk') or {}
+            if bulk_config.get('enabled'):
+                bulk = bulk_config.get('queries') or [{}]
+
+            print('Fetching BibTeX records.')
+            with profiler.stage('bibtex') as stage, \
+                    (DumpWriter(f'{dump_dir}/bibtex.ndjson.gz') if debug else nullcontext()) as dump:
+                texts = read_dump(f'{dump_dir}/bibtex.ndjson.gz') if args.from_dump else None
+                bib_store = load_bibtex(publishers, session=s, executor=executor, bulk=bulk,
+                                        memo=state.setdefault('bibtex', {}), dump=dump, texts=texts)
+                stage['records'] = len(bib_store)
+            for entry_id in bib_store.conflicts:
+                print(f'BibTeX ID "{entry_id}" is used by differing records. Using the first one.')
+
+            print('Fetching publications.')
+            with profiler.stage('publications') as stage, \
+                    (DumpWriter(f'{dump_dir}/publications.ndjson.gz') if debug else nullcontext()) as dump:
+                records = read_dump(f'{dump_dir}/publications.ndjson.gz') if args.from_dump else None
+                # co-authors with a profile who are not fetched (e.g. blacklisted or former members) are linked as well
+                content.refresh()
+                resolver = load_profile_resolver(content, config['publications']['transform'], people=publishers)
+                empty = []
+                posts = load_publications(publishers, bib_store, resolver, session=s, executor=executor, bulk=bulk,
+                                          dump=dump, records=records, empty=empty)
+                stage['records'] = len(posts)
+            listed = {pub_id for pub_id, _ in posts}
+            if resolver.unresolved:
+                print(f'Authors sharing the last name of a person but not matched to them: '
+                      f'{", ".join(sorted(resolver.unresolved))}. Add them to publications.transform in the config if '
+                      f'they are the same person.')
+
+            duplicates_config = config['publications'].get('duplicates') or {}
+            merged = {}
+            with profiler.stage('duplicates') as stage:
+                clusters = find_duplicates(posts, bib_store, threshold=duplicates_config.get('threshold', 0.8))
+                stage['records'] = len(posts)
+            writer.write(args.duplicates_path, json.dumps(report(posts, clusters), indent=4, ensure_ascii=False) + '\n')
+            if clusters:
+                action = 'Merging' if duplicates_config.get('merge') else 'Found'
+                print(f'{action} {len(clusters)} clusters of duplicate publications, see "{args.duplicates_path}".')
+                if duplicates_config.get('merge'):
+                    posts = merge_duplicates(posts, clusters)
+                    merged = {pub_id: cluster[0] for cluster in clusters for pub_id in cluster[1:]}
+
+            # a query without records most likely failed upstream, pruning would remove all publications it should
+            # return
+            prune = None
+            if args.prune and empty:
+                print(f'Not removing withdrawn publications as {len(empty)} publik queries did not return any records.')
+            elif args.prune:
+                prune = {p['identifier'] for p in publishers}
+
+            print(f'Storing results to "content/publication".')
+            if 'manifest' not in state:
+                state['manifest'] = Manifest(args.manifest_path or f'{args.cache_dir}/publications.manifest.json')
+            manifest = state['manifest']
+            with profiler.stage('publication files') as stage:
+                content.refresh()
+                counts = sync_publications(posts, bib_store, content, manifest, writer, override=args.override,
+                                           prune=prune, listed=listed, resolver=resolver, merged=merged)
+                stage['records'] = len(posts)
+            print(f'Publications: {counts["added"]} added, {counts["changed"]} changed, '
+                  f'{counts["unchanged"]} unchanged, {counts["skipped"]} skipped, {counts["removed"]} removed.')
+
+        # the generated site files are not committed, they are only built for the deploy (and for local previews)
+        if args.site_index:
+            with profiler.stage('author index') as stage:
+                content.refresh()
+                resolver = load_profile_resolver(content, config['publications']['transform'])
+                authors = sync_author_index(content, resolver, data_dir, writer)
+                stage['records'] = len(authors)
+            print(f'Author index: {stage["records"]} profiles.')
+
+            with profiler.stage('publication buckets') as stage:
+                stage['records'] = sync_publication_buckets(content, resolver, data_dir, base_dir + '/static', authors,
+                                                            writer)
+            print(f'Publication buckets: {stage["records"]} publications.')
+
+            with profiler.stage('search index') as stage:
+                stage['records'] = sync_search_index(content_dir, data_dir, base_dir + '/static', writer)
+            print(f'Search index: {stage["records"]} pages.')
+
+            if can_encode():
+                with profiler.stage('images') as stage:
+                    stage['records'], encoded = sync_images(content_dir, base_dir + '/static', args.cache_dir, writer,
+                                                            max_workers=args.image_workers)
+                print(f'Images: {stage["records"]} images, {encoded} derivatives encoded.')
+            else:
+                print('Images: Pillow is not installed, no derivatives written.')
+
+        content.save()
+        print(f'Content index: {len(content.files)} files, {content.parsed - parsed} front matters parsed.')
+        print(f'Output: {writer.summary()}.')
+
+        if cache_stats is not None:
+            stats = {k: v - cache_stats[k] for k, v in s.stats.items()}
+            print(f'Response cache: {stats["hits"]} hits, {stats["revalidated"]} revalidated, '
+                  f'{stats["downloaded"]} downloaded ({stats["bytes"]} bytes).')
+
+        for host, stats in executor.stats().items():
+            before = host_stats.get(host, {})
+            counts = {k: stats[k] - before.get(k, 0) for k in ('requests', 'retries', 'throttled', 'failures')}
+            if counts['requests']:
+                print(f'Host {host}: {counts["requests"]} requests, {counts["retries"]} retries, '
+                      f'{counts["throttled"]} throttled, {counts["failures"]} failed, '
+                      f'mean latency {stats["latency"]:.3f}s, '
+                      f'concurrency {stats["limit"]:.1f} (min {stats["min_limit"]:.1f}).')
+    finally:
+        # the session is shared by all refreshes of the daemon, a failed refresh must not leave the hook behind
+        if args.profile_path:
+            profiler.detach(s)
+
+    if args.profile_path:
+        profiler.save(args.profile_path, arguments=sys.argv[1:], workers=args.workers, per_host=args.per_host,
+                      cache=None if args.no_cache else s.stats, hosts=executor.stats())
+        print(f'Profile written to "{args.profile_path}".')
+
+    if args.profile_stats_path:
+        stage = profiler.dump_slowest(args.profile_stats_path)
+        print(f'cProfile stats of the slowest stage ({stage}) written to "{args.profile_stats_path}".')
+
+    return True
 
 
 def main():
@@ -288,6 +1103,18 @@ def main():
     argparser.add_argument('-p', '--publications',
                            help='fetch publications affiliated with BIG members', action='store_true',
                            dest='fetch_publications')
+    argparser.add_argument('--semesters',
+                           help='semesters to fetch courses for, as comma separated list or range of semesters, '
+                                'e.g. "2015W..current". Defaults to "previous..current"',
+                           default='previous..current',
+                           metavar='RANGE', dest='semesters')
+    argparser.add_argument('--refresh-archive',
+                           help='fetch archived semesters again', action='store_true',
+                           dest='refresh_archive')
+    argparser.add_argument('-s', '--site-index',
+                           help='build the author index, publication buckets, search index and image derivatives',
+                           action='store_true',
+                           dest='site_index')
     argparser.add_argument('-o', '--override',
                            help='override existing content', action='store_true',
                            dest='override')
@@ -304,225 +1131,156 @@ def main():
                            default='../..',
                            metavar='PATH', dest='base_path')
     argparser.add_argument('-d', '--debug',
-                           help='dumps fetched data to the /data directory', action='store_true',
+                           help='dumps fetched people, BibTeX and publication records to the dump directory',
+                           action='store_true',
                            dest='debug')
+    argparser.add_argument('--dump-dir',
+                           help='provide the path of the debug dumps. Defaults to "dumps"',
+                           default='dumps',
+                           metavar='PATH', dest='dump_dir')
+    argparser.add_argument('--from-dump',
+                           help='replay the records of the debug dumps instead of fetching them. Nothing is requested',
+                           action='store_true',
+                           dest='from_dump')
+    argparser.add_argument('-w', '--workers',
+                           help='maximum number of concurrent requests. Defaults to 8',
+                           default=8, type=int,
+                           metavar='N', dest='workers')
+    argparser.add_argument('--per-host',
+                           help='maximum number of concurrent requests per host. Defaults to 4',
+                           default=4, type=int,
+                           metavar='N', dest='per_host')
+    argparser.add_argument('--retries',
+                           help='number of retries of failed requests. Defaults to 3',
+                           default=3, type=int,
+                           metavar='N', dest='retries')
+    argparser.add_argument('--timeout',
+                           help='seconds to wait for a server to send data before the request fails. Defaults to 60',
+                           default=60, type=float,
+                           metavar='SECONDS', dest='timeout')
+    argparser.add_argument('--image-workers',
+                           help='number of processes encoding image derivatives. Defaults to the number of CPUs',
+                           default=None, type=int,
+                           metavar='N', dest='image_workers')
+    argparser.add_argument('--cache-dir',
+                           help='provide the path of the response cache. Defaults to ".cache"',
+                           default='.cache',
+                           metavar='PATH', dest='cache_dir')
+    argparser.add_argument('--cache-ttl',
+                           help='seconds a cached response without ETag or Last-Modified header is reused. '
+                                'Defaults to 3600',
+                           default=3600, type=int,
+                           metavar='SECONDS', dest='cache_ttl')
+    argparser.add_argument('--no-cache',
+                           help='disable the response cache', action='store_true',
+                           dest='no_cache')
+    argparser.add_argument('--offline',
+                           help='serve all requests from the response cache', action='store_true',
+                           dest='offline')
+    argparser.add_argument('--manifest',
+                           help='provide the path of the publication manifest. '
+                                'Defaults to "publications.manifest.json" in the cache directory',
+                           default=None,
+                           metavar='PATH', dest='manifest_path')
+    argparser.add_argument('--prune',
+                           help='remove publications created by a previous run that are no longer listed in publik. '
+                                'Only publications of fetched people are removed, none if a query returned no '
+                                'records',
+                           action='store_true',
+                           dest='prune')
+    argparser.add_argument('--duplicates-report',
+                           help='provide the path of the report of duplicate publications. '
+                                'Defaults to "publications.duplicates.json"',
+                           default='publications.duplicates.json',
+                           metavar='PATH', dest='duplicates_path')
+    argparser.add_argument('--profile',
+                           help='write a report of the timings, requests and written files of every stage. '
+                                'Defaults to "profile.json"',
+                           nargs='?', const='profile.json',
+                           metavar='PATH', dest='profile_path')
+    argparser.add_argument('--profile-stats',
+                           help='run every stage under cProfile and dump the stats of the slowest one',
+                           metavar='PATH', dest='profile_stats_path')
+    argparser.add_argument('--daemon',
+                           help='keep running and refresh the selected parts on their intervals', action='store_true',
+                           dest='daemon')
+    argparser.add_argument('--members-interval',
+                           help='seconds between member refreshes of the daemon. Defaults to 86400',
+                           default=86400, type=int,
+                           metavar='SECONDS', dest='members_interval')
+    argparser.add_argument('--courses-interval',
+                           help='seconds between course refreshes of the daemon. Defaults to 86400',
+                           default=86400, type=int,
+                           metavar='SECONDS', dest='courses_interval')
+    argparser.add_argument('--publications-interval',
+                           help='seconds between publication refreshes of the daemon. Defaults to 21600',
+                           default=21600, type=int,
+                           metavar='SECONDS', dest='publications_interval')
+    argparser.add_argument('--trigger-port',
+                           help='port on localhost the daemon listens on for refresh requests, 0 disables it. '
+                                'Defaults to 8765',
+                           default=8765, type=int,
+                           metavar='PORT', dest='trigger_port')
     args = argparser.parse_args()
 
-    if not (args.fetch_members or args.fetch_courses or args.fetch_publications):
+    if not (args.fetch_members or args.fetch_courses or args.fetch_publications or args.site_index):
         print('Aborting as there is nothing to do. Run with "-h" for help.')
         return
 
-    if not args.override:
-        print('Override is disabled. Existing files will not be touched. Run with "-o" to enable override.')
-
-    base_dir = args.base_path.rstrip('/')
-    data_dir = base_dir + '/data'
-    content_dir = base_dir + '/content'
-    people_dir = content_dir + '/people'
-    publication_dir = content_dir + '/publication'
-
-    template_dir = 'templates'
-
-    # load config
-    try:
-        with open(args.config_path, 'r', encoding='utf-8') as yml:
-            config = yaml.safe_load(yml)
-    except Exception as e:
-        print('Cannot read config file: ', e)
+    if args.offline and args.no_cache:
+        print('Aborting as offline mode requires the response cache.')
         return
 
-    # load group config
-    try:
-        with open(args.group_config_path, 'r', encoding='utf-8') as yml:
-            group_config = yaml.safe_load(yml)
-    except Exception as e:
-        print('Cannot read group config file: ', e)
+    if args.daemon and not (args.fetch_members or args.fetch_courses or args.fetch_publications):
+        print('Aborting as the daemon needs at least one part to refresh.')
         return
 
-    s = requests.Session()
-
-    # fetch members
-    r = s.get(PEOPLE_URL)
-    data = r.json()
-    tiss_employees = data['employees']
-
-    # add identifiers
-    for person in tiss_employees:
-        person['identifier'] = _id(person['first_name'] + ' ' + person['last_name'])
-
-    # apply whitelist
-    print('Applying whitelist based on group config.')
-
-    groups = group_config['groups']
-    name_grouped_people = {}
-    for group_name, group_members in groups.items():
-        for name in group_members:
-            if name not in name_grouped_people:
-                name_grouped_people[name] = group_name
-    id_grouped_people = dict((_id(k), v) for k, v in name_grouped_people.items())
-
-    tiss_employees = [p for p in tiss_employees if p['identifier'] in id_grouped_people.keys()]
-
-    if args.fetch_members:
-        print('Fetching people. Creating files for new people in the "content/authors" directory.')
-
-        # apply data from TISS to profiles (and create new pages)
-        # only profiles listed in the group config will be handled
-        for person in tiss_employees:
-            first_name = person['first_name']
-            last_name = person['last_name']
-            name = f'{first_name} {last_name}'
-            directory = f'{people_dir}/{person["identifier"]}'
-            template_source = template_dir + '/authors/user/_index.md'
-
-            # create folder
-            if not os.path.exists(directory):
-                # dir does not exist
-                print(f'Creating author files for {name}.')
-                os.makedirs(directory)
-            elif not args.override:
-                # dir does exist, but override is disabled
-                continue
-            else:
-                # dir does exist
-                template_source = directory + '/_index.md'
-
-            # download profile pic or copy default
-            pic_dest = directory + '/avatar.jpg'
-            if person['picture_uri']:
-                urllib.request.urlretrieve(TISS_BASE + person['picture_uri'], pic_dest)
-            else:
-                shutil.copyfile(template_dir + '/authors/user/avatar.jpg', pic_dest)
-
-            # apply metadata to markdown front matter
-            post = frontmatter.load(template_source)
-
-            pairs = []
-            if 'pairs' in post:
-                pairs = post['pairs']
-
-            email = person["main_email"]
-            big_mails = list(filter(lambda mail: '@big.tuwien.ac.at' in mail, person['other_emails']))
-            if len(big_mails) > 0:
-                email = big_mails[0]
-
-            mail_pair = {'key': 'Mail', 'value': email, 'link': f'mailto:{email}'}
-
-            phone = person['main_phone_number']
-            phone_pair = None
-            if phone:
-                phone_pair = {'key': 'Phone', 'value': phone, 'link': f'tel:{phone}'}
-
-            room_pair = None
-            if 'room_code' in person:
-                room = person['room_code']
-                room_pair = {'key': 'Location', 'value': room}
-
-            # get remaining pairs that might have been defined individually such as office hours
-            remaining_pairs = list(filter(
-                lambda p: 'key' not in p or (p['key'] != 'Mail' and p['key'] != 'Phone' and p['key'] != 'Location'),
-                pairs
-            ))
-
-            pairs = [mail_pair]
-            if phone_pair:
-                pairs.append(phone_pair)
-            if room_pair:
-                pairs.append(room_pair)
-            pairs.extend(remaining_pairs)
-
-            post['name'] = name
-            post['email'] = email
-            post['authors'] = [person["identifier"]]
-            post['role'] = person['preceding_titles']
-            post['pairs'] = pairs
-
-            with open(f'{directory}/_index.md', 'w+', encoding='utf-8') as f:
-                f.write(frontmatter.dumps(post))
-
-        # adjust groups for all profiles
-        default_group = group_config['default']
-        existing_profiles = [f.path for f in os.scandir(people_dir) if f.is_dir()]
-        for profile_path in existing_profiles:
-            folder_id = basename(normpath(profile_path))
-            group = id_grouped_people.get(folder_id, default_group)
-
-            index_file = profile_path + '/_index.md'
-            post = frontmatter.load(index_file)
-            post['user_groups'] = [group]
-            with open(index_file, 'w+', encoding='utf-8') as f:
-                f.write(frontmatter.dumps(post))
-
-        if args.debug:
-            with open(f'{data_dir}/people.json', 'w+', encoding='utf-8') as f:
-                f.write(json.dumps(tiss_employees, indent=4))
-
-    if args.fetch_courses:
-        # fetch courses. has to be done separately for each person
-        # as fetching courses for the institute returns an empty set
-        print('Fetching courses. Creating files for courses in the "content/teaching" directory.')
-
-        current_semester, prev_semester = _get_semesters()
-
-        semesters = [current_semester, prev_semester]
-
-        lecturer_blacklist = [_id(name) for name in config['courses']['blacklist']]
-        lecturers = [p for p in tiss_employees if p['identifier'] not in lecturer_blacklist]
-
-        for semester in semesters:
-            print(f'Fetching courses for semester {semester}.')
-
-            courses = load_courses(lecturers, semester=semester, session=s)
-
-            with open(f'{data_dir}/teaching/courses/{semester}.json', 'w+', encoding='utf-8') as f:
-                f.write(json.dumps(courses, indent=4))
-
-    if args.fetch_publications:
-        # fetch publications
-
-        # right now publications are fetched based on the people records in TISS. If there is no TISS record
-        # in the BIG org unit for this person, no publications will be loaded.
-        # If required, this step can be skipped by splitting the names from the config into first and last name.
-        # (edge case: people with multiple first names)
-
-        publisher_blacklist = [_id(name) for name in config['publications']['blacklist']]
-        publishers = [p for p in tiss_employees if p['identifier'] not in publisher_blacklist]
+    if args.from_dump and args.daemon:
+        print('Aborting as the daemon cannot replay dumps.')
+        return
 
-        print('Fetching BibTeX records.')
-        bib_db = load_bibtex(publishers, session=s)
+    if args.from_dump:
+        dumps = []
+        if args.fetch_members or args.fetch_courses or args.fetch_publications:
+            dumps.append('people.ndjson.gz')
+        if args.fetch_publications:
+            dumps.extend(['bibtex.ndjson.gz', 'publications.ndjson.gz'])
+        missing = [name for name in dumps if not os.path.exists(f'{args.dump_dir.rstrip("/")}/{name}')]
+        if missing:
+            print(f'Aborting as the debug dumps {", ".join(missing)} do not exist in "{args.dump_dir}". '
+                  f'Run with "-d" to create them.')
+            return
 
-        print('Fetching publications.')
-        publications, posts = load_publications(publishers, bib_db, config['publications']['transform'], session=s)
+    try:
+        _parse_semesters(args.semesters, *_get_semesters(at=datetime.datetime.now()))
+    except ValueError as e:
+        print(f'Aborting as the semesters cannot be parsed: {e}')
+        return
 
-        if args.debug:
-            with open(f'{data_dir}/publications.json', 'w+', encoding='utf-8') as f:
-                f.write(json.dumps(publications, indent=4))
+    if not args.override:
+        print('Override is disabled. Existing files will not be touched. Run with "-o" to enable override.')
 
-        print(f'Storing results to "content/publication".')
-        for identifier, post in posts:
-            directory = f'{publication_dir}/{identifier}'
+    if args.no_cache:
+        s = requests.Session()
+    else:
+        s = CachingSession(ResponseCache(args.cache_dir, ttl=args.cache_ttl), offline=args.offline)
+    state = {'session': s, 'executor': FetchExecutor(s, max_workers=args.workers, per_host=args.per_host,
+                                                     retries=args.retries, timeout=args.timeout)}
 
-            # create folder
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-            elif not args.override:
-                continue
+    if not args.daemon:
+        sync(args, state, members=args.fetch_members, courses=args.fetch_courses,
+             publications=args.fetch_publications)
+        return
 
-            bib_entry = None
-            for entry in bib_db.entries:
-                if entry['ID'].lower() == identifier:
-                    bib_entry = entry
-                    break
-
-            if bib_entry:
-                db = bibtexparser.bibdatabase.BibDatabase()
-                db.entries = [bib_entry]
-                writer = bibtexparser.bwriter.BibTexWriter()
-                with open(f'{directory}/cite.bib', 'w+', encoding='utf-8') as f:
-                    f.write(writer.write(db))
-
-            with open(f'{directory}/index.md', 'w+', encoding='utf-8') as f:
-                f.write(frontmatter.dumps(post))
+    # refresh the selected parts on their own intervals until the daemon is stopped
+    intervals = {part: interval for part, enabled, interval in (
+        ('members', args.fetch_members, args.members_interval),
+        ('courses', args.fetch_courses, args.courses_interval),
+        ('publications', args.fetch_publications, args.publications_interval),
+    ) if enabled}
+    daemon = Daemon(lambda parts: sync(args, state, **dict.fromkeys(parts, True)), intervals,
+                    port=args.trigger_port or None)
+    daemon.run()
 
 
 if __name__ == '__main__':
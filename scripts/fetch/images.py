@@ -0,0 +1,106 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Pillow is optional, without it no derivatives are created and the templates let hugo resize the originals
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# sizes of the derivatives by kind of image (matched like the GetMatch "*avatar*" and "*featured*" of the templates).
+# They are the sizes the templates ask for in layouts/partials/functions/get_image.html: "WxH" crops the image to fill
+# the size, "Wx" scales it down to the width
+SIZES = {'avatar': ['270x270'], 'featured': ['150x', '540x', '550x']}
+EXTENSIONS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG'}
+QUALITY = 85
+
+
+def can_encode():
+    return Image is not None
+
+
+def _kind(name):
+    for kind in SIZES:
+        if kind in name.lower():
+            return kind
+    return None
+
+
+def find_images(content_dir, derived_dir):
+    # yields (source path, path of the derivatives without size and extension) for every avatar and featured image of
+    # the pages. Derivatives keep the path of the image relative to the content directory, e.g.
+    # content/people/x/avatar.jpg becomes <derived_dir>/people/x/avatar-270x270.webp
+    for root, dirs, files in os.walk(content_dir):
+        dirs.sort()
+        for name in sorted(files):
+            stem, extension = os.path.splitext(name)
+            if extension.lower() in EXTENSIONS and _kind(stem):
+                relative = os.path.relpath(os.path.join(root, stem), content_dir).replace(os.sep, '/')
+                yield os.path.join(root, name), f'{derived_dir}/{relative}'
+
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _render(job):
+    # runs on the process pool: scales the source to one size and saves it as WebP and in its own format
+    source, size, targets = job
+    width, _, height = size.partition('x')
+    try:
+        image = Image.open(source)
+        image.load()
+    except OSError as e:
+        print(f'Cannot read image {source}: ', e)
+        return 0
+
+    with image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode or 'transparency' in image.info else 'RGB')
+        if height:
+            image = ImageOps.fit(image, (int(width), int(height)), Image.LANCZOS)
+        elif image.width > int(width):
+            image = image.resize((int(width), round(image.height * int(width) / image.width)), Image.LANCZOS)
+
+        for image_format, path in targets:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            output = image.convert('RGB') if image_format == 'JPEG' else image
+            output.save(tmp_path, image_format, quality=QUALITY, optimize=image_format != 'WEBP')
+            os.replace(tmp_path, path)
+    return len(targets)
+
+
+def render_derivatives(images, cache_dir, max_workers=None):
+    # Returns (derivatives, encoded). derivatives is a list of (cached file, destination) tuples for the derivatives
+    # of images ((source, destination stem) tuples, see find_images), encoded the number of files encoded in this run.
+    # Derivatives are cached in cache_dir under the hash of the source content, so an image is only encoded again if
+    # it changed. Missing derivatives are encoded on a process pool
+    results = []
+    jobs = []
+    for source, stem in images:
+        extension = os.path.splitext(source)[1].lower()
+        digest = _digest(source)
+        for size in SIZES[_kind(os.path.basename(stem))]:
+            targets = []
+            for suffix, image_format in (('.webp', 'WEBP'), (extension, EXTENSIONS[extension])):
+                cached = f'{cache_dir}/{digest[:2]}/{digest}-{size}{suffix}'
+                results.append((cached, f'{stem}-{size}{suffix}'))
+                if not os.path.exists(cached):
+                    targets.append((image_format, cached))
+            if targets:
+                jobs.append((source, size, targets))
+
+    if len(jobs) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            encoded = sum(pool.map(_render, jobs))
+    else:
+        encoded = sum(map(_render, jobs))
+    # images that cannot be read have no derivatives, the templates fall back to resizing them with hugo
+    return [(cached, path) for cached, path in results if os.path.exists(cached)], encoded
@@ -0,0 +1,38 @@
+import hashlib
+import json
+import os
+
+
+class Manifest:
+    # Maps content ids to the hash of the files that were generated for them in a previous run.
+    # It is used to find out which records changed upstream without reading the generated files again.
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def digest(*parts):
+        h = hashlib.sha256()
+        for part in parts:
+            h.update((part or '').encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def unchanged(self, identifier, digest):
+        return self.entries.get(identifier) == digest
+
+    def update(self, identifier, digest):
+        self.entries[identifier] = digest
+
+    def remove(self, identifier):
+        self.entries.pop(identifier, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w+', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=4, sort_keys=True)
+            f.write('\n')
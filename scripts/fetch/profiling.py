@@ -0,0 +1,121 @@
+import cProfile
+import datetime
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# numeric path segments (oids, tids) and hashed file names (profile pics) are collapsed, so requests to the same api
+# are reported as one endpoint
+ID_SEGMENT = re.compile(r'/(\d+|[0-9a-f]{8,}(\.\w+)?)(?=/|$)')
+
+
+def _endpoint(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}{ID_SEGMENT.sub("/{id}", parts.path)}'
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+class Profiler:
+    # Collects per-stage timings, per-endpoint request statistics and record/file counts of a fetch run.
+    # Stages are timed with the stage context manager, requests are recorded by a response hook of the session.
+    # If cprofile is set, every stage runs under cProfile and the stats of the slowest stage are kept. cProfile only
+    # sees the main thread, run with "-w 1" to include the work done on the request workers.
+
+    def __init__(self, writer=None, cprofile=False):
+        self.writer = writer
+        self.cprofile = cprofile
+        self.stages = []
+        self.requests = {}
+        self.slowest = None
+        self._lock = threading.Lock()
+        self._started = time.perf_counter(), time.process_time()
+
+    def attach(self, session):
+        session.hooks['response'].append(self._record_response)
+
+    def detach(self, session):
+        session.hooks['response'].remove(self._record_response)
+
+    def _record_response(self, r, *args, **kwargs):
+        # the hook runs before the body is read, reading it here adds the download to the latency of the request.
+        # streamed bodies are left alone, their size is taken from the header
+        start = time.perf_counter()
+        if kwargs.get('stream'):
+            size = int(r.headers.get('Content-Length', 0))
+        else:
+            size = len(r.content)
+        latency = r.elapsed.total_seconds() + time.perf_counter() - start
+        with self._lock:
+            endpoint = self.requests.setdefault(_endpoint(r.url), {'latencies': [], 'bytes': 0, 'status': {}})
+            endpoint['latencies'].append(latency)
+            endpoint['bytes'] += size
+            endpoint['status'][str(r.status_code)] = endpoint['status'].get(str(r.status_code), 0) + 1
+        return r
+
+    @contextmanager
+    def stage(self, name):
+        # yields the stage record, callers add the number of records they parsed as 'records'
+        stage = {'name': name}
+        written = (self.writer.written, self.writer.skipped) if self.writer else None
+        profile = cProfile.Profile() if self.cprofile else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield stage
+        finally:
+            if profile:
+                profile.disable()
+            stage['wall'] = round(time.perf_counter() - wall, 4)
+            stage['cpu'] = round(time.process_time() - cpu, 4)
+            if written:
+                stage['written'] = self.writer.written - written[0]
+                stage['unchanged'] = self.writer.skipped - written[1]
+            self.stages.append(stage)
+            if profile and (self.slowest is None or stage['wall'] > self.slowest[0]['wall']):
+                self.slowest = stage, profile
+
+    def report(self, **meta):
+        endpoints = {}
+        for endpoint, stats in sorted(self.requests.items()):
+            latencies = stats['latencies']
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'bytes': stats['bytes'],
+                'status': stats['status'],
+                'latency': {
+                    'total': round(sum(latencies), 4),
+                    'mean': round(sum(latencies) / len(latencies), 4),
+                    'p50': round(_percentile(latencies, 50), 4),
+                    'p95': round(_percentile(latencies, 95), 4),
+                    'max': round(max(latencies), 4),
+                },
+            }
+
+        return {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            **meta,
+            'wall': round(time.perf_counter() - self._started[0], 4),
+            'cpu': round(time.process_time() - self._started[1], 4),
+            'stages': self.stages,
+            'endpoints': endpoints,
+        }
+
+    def save(self, path, **meta):
+        with open(path, 'w+', encoding='utf-8') as f:
+            json.dump(self.report(**meta), f, indent=4)
+
+    def dump_slowest(self, path):
+        # returns the name of the dumped stage. The dump can be inspected with pstats or snakeviz
+        if not self.slowest:
+            return None
+        stage, profile = self.slowest
+        profile.dump_stats(path)
+        return stage['name']
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import re
+import unicodedata
+from collections import defaultdict
+
+import frontmatter
+
+# weight of a term occurrence per field, the score of a document for a term is the sum over all occurrences
+FIELD_WEIGHTS = {'title': 8, 'authors': 4, 'tags': 4, 'summary': 2, 'content': 1}
+# terms are sharded by their first characters, a query only loads the shards of its terms
+PREFIX_LENGTH = 2
+SUMMARY_WORDS = 30
+
+SHORTCODE = re.compile(r'{{[<%].*?[%>]}}', re.S)
+HTML_TAG = re.compile(r'<[^>]+>')
+MARKDOWN_LINK = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+# the home page bundle uses toml front matter, which can only be parsed if the toml package is installed
+HEADLESS = re.compile(r'^headless\s*[:=]\s*true', re.M)
+
+
+def tokenize(text):
+    # lower case words of letters and digits without accents. The search script normalizes queries the same way
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.findall(r'[a-z0-9]+', text)
+
+
+def _plain(markdown):
+    text = SHORTCODE.sub(' ', markdown)
+    text = MARKDOWN_LINK.sub(r'\1', text)
+    text = HTML_TAG.sub(' ', text)
+    return ' '.join(re.sub(r'[#*_>`|]', ' ', text).split())
+
+
+def _load(path):
+    # returns (metadata, content). frontmatter.load fails for pages with a "content" parameter (e.g. the docs pages)
+    with open(path, 'r', encoding='utf-8') as f:
+        return frontmatter.parse(f.read())
+
+
+def _sanitize(path):
+    # the path sanitization of hugo (UnicodeSanitize with removePathAccents): letters, digits, marks and . / \ _ # + ~
+    # are kept, runs of hyphens and spaces become a single hyphen between kept characters, everything else is dropped
+    kept = []
+    hyphen = False
+    for i, c in enumerate(path):
+        category = unicodedata.category(c)
+        if c in './\\_#+~' or category[0] in 'LM' or category == 'Nd' or \
+                (c == '%' and re.match(r'[0-9a-fA-F]{2}$', path[i + 1:i + 3])):
+            if hyphen:
+                kept.append('-')
+                hyphen = False
+            kept.append(c)
+        elif kept and (c == '-' or c.isspace()):
+            hyphen = True
+    text = unicodedata.normalize('NFD', ''.join(kept))
+    return unicodedata.normalize('NFC', ''.join(c for c in text if not unicodedata.combining(c)))
+
+
+def _url(content_dir, path, post):
+    # the url hugo generates for a page: sanitized lower case path without the file extension, bundles use their
+    # directory. Urls set in the front matter are used as they are
+    if post.get('url'):
+        return '/' + post['url'].strip('/') + '/'
+    path = os.path.relpath(path, content_dir).replace(os.sep, '/')
+    directory, name = path.rsplit('/', 1) if '/' in path else ('', path)
+    if name in ('index.md', '_index.md'):
+        return _sanitize(f'/{directory}/').lower()
+    slug = post.get('slug') or name[:-3]
+    return _sanitize(f'/{directory}/{slug}/').lower().replace('//', '/')
+
+
+def load_documents(content_dir):
+    # Collects the pages the search covers, the same pages as layouts/index.json: regular pages, docs sections and
+    # people profiles. Drafts, private pages and headless bundles (the widgets of the home page) are left out.
+    # Returns a list of documents sorted by url
+    documents = []
+    names = {}
+    for root, dirs, files in os.walk(content_dir):
+        dirs.sort()
+        if 'index.md' in files:
+            with open(f'{root}/index.md', 'r', encoding='utf-8') as f:
+                if HEADLESS.search(f.read()):
+                    dirs.clear()
+                    continue
+        for name in sorted(files):
+            if not name.endswith('.md'):
+                continue
+            path = f'{root}/{name}'
+            post, content = _load(path)
+            if post.get('draft') or post.get('private'):
+                continue
+
+            section = os.path.relpath(path, content_dir).replace(os.sep, '/').split('/')[0]
+            title = post.get('title')
+            if name == '_index.md':
+                if section == 'people' and post.get('name'):
+                    title = post['name']
+                    names[os.path.basename(root)] = title
+                elif post.get('type') != 'docs':
+                    continue
+
+            content = _plain(content)
+            summary = post.get('summary') or post.get('abstract') or ' '.join(content.split()[:SUMMARY_WORDS])
+            documents.append({
+                'url': _url(content_dir, path, post),
+                'title': title or '',
+                'section': section if section != name else '',
+                'summary': _plain(summary),
+                'authors': [str(author) for author in post.get('authors') or []],
+                'tags': [str(tag) for tag in (post.get('tags') or []) + (post.get('categories') or [])],
+                'content': content,
+            })
+
+    # profiles list their own id as author, search for the name instead
+    for document in documents:
+        document['authors'] = [names.get(author, author) for author in document['authors']]
+    return sorted(documents, key=lambda document: document['url'])
+
+
+def build_index(documents):
+    # Returns (docs, shards, version). docs is the list of [url, title, section, summary] the results are rendered
+    # from, the position in the list is the id of a document. shards maps a term prefix to {term: postings}, where
+    # postings is a flat list of document ids and scores ([id, score, id, score, ...]) sorted by id.
+    # version changes with every change of the index, the search script appends it to the shard urls
+    scores = defaultdict(lambda: defaultdict(int))
+    for doc_id, document in enumerate(documents):
+        for field, weight in FIELD_WEIGHTS.items():
+            value = document[field]
+            for token in tokenize(' '.join(value) if isinstance(value, list) else value):
+                if len(token) >= PREFIX_LENGTH:
+                    scores[token][doc_id] += weight
+
+    shards = defaultdict(dict)
+    for term in sorted(scores):
+        shards[term[:PREFIX_LENGTH]][term] = [value for posting in sorted(scores[term].items()) for value in posting]
+
+    docs = [[document['url'], document['title'], document['section'], document['summary']] for document in documents]
+    version = hashlib.sha256(repr((docs, sorted(shards.items()))).encode('utf-8')).hexdigest()[:12]
+    return docs, dict(shards), version
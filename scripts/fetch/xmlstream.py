@@ -0,0 +1,74 @@
+import codecs
+import xml.etree.ElementTree as ET
+
+
+def _name(tag, namespaces):
+    # mirrors the naming of xmltodict: namespaces mapped to None are dropped, unknown namespaces are kept as prefix.
+    # without a namespace mapping the namespace is dropped entirely
+    if tag[0] != '{':
+        return tag
+    uri, local = tag[1:].split('}', 1)
+    if namespaces is None:
+        return local
+    if uri in namespaces:
+        prefix = namespaces[uri]
+        return f'{prefix}:{local}' if prefix else local
+    return f'{uri}:{local}'
+
+
+def element_to_dict(element, namespaces=None):
+    # converts an element to the structure xmltodict.parse creates with its default settings
+    # (attributes prefixed with '@', text as '#text' next to attributes or children, repeated children as list)
+    result = {}
+    for key, value in element.attrib.items():
+        result['@' + _name(key, namespaces)] = value
+
+    for child in element:
+        key = _name(child.tag, namespaces)
+        value = element_to_dict(child, namespaces)
+        if key not in result:
+            result[key] = value
+        elif isinstance(result[key], list):
+            result[key].append(value)
+        else:
+            result[key] = [result[key], value]
+
+    text = ''.join([element.text or ''] + [child.tail or '' for child in element]).strip()
+    if not result:
+        return text or None
+    if text:
+        result['#text'] = text
+    return result
+
+
+def iter_records(chunks, tag, root=None, encoding=None, namespaces=None):
+    # Parses an xml document incrementally and yields every direct child of the root element named `tag` as soon as
+    # it is complete, converted by element_to_dict. Records are discarded after they were yielded, so memory usage
+    # depends on the size of a single record rather than the whole document.
+    # chunks is an iterable of bytes (e.g. response.iter_content()). If encoding is given, the declared encoding
+    # of the document is ignored and the chunks are decoded with it instead.
+    # If root is given, nothing is yielded for documents with a different root element.
+    if encoding:
+        chunks = codecs.iterdecode(chunks, encoding)
+
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    depth = 0
+    root_element = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                depth += 1
+                if depth == 1:
+                    root_element = element
+                    if root and _name(element.tag, namespaces) != root:
+                        return
+                continue
+
+            depth -= 1
+            if depth == 1:
+                if _name(element.tag, namespaces) == tag:
+                    yield element_to_dict(element, namespaces)
+                # records are not needed anymore once they are converted
+                root_element.remove(element)
+    parser.close()
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class OfflineSnapshotMiss(Exception):
+    pass
+
+
+class Crawler:
+    # Fetches pages of the old website on a bounded worker pool. Requests to the same host are spaced out so that no
+    # more than `rate` requests per second are sent to it, no matter how many workers there are.
+    # If a SnapshotStore is given, pages are served from it and only missing pages are downloaded (and stored).
+    # With refetch, every page is downloaded again; offline raises OfflineSnapshotMiss for missing pages.
+
+    def __init__(self, session=None, max_workers=8, rate=10.0, snapshots=None, refetch=False, offline=False):
+        self.session = session if session is not None else requests.Session()
+        self.snapshots = snapshots
+        self.refetch = refetch
+        self.offline = offline
+        self.max_workers = max(1, max_workers)
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+        # keep a connection per worker alive
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _wait(self, url):
+        # reserves the next free slot of the host and sleeps until it is reached
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def get(self, url, **kwargs):
+        self._wait(url)
+        return self.session.get(url, **kwargs)
+
+    def fetch(self, url):
+        # returns the content of the page, from the snapshot store if possible
+        if self.snapshots and not self.refetch:
+            content = self.snapshots.get(url)
+            if content is not None:
+                return content
+        if self.offline:
+            raise OfflineSnapshotMiss(f'No snapshot of {url}')
+
+        r = self.get(url)
+        r.raise_for_status()
+        if self.snapshots:
+            self.snapshots.put(url, r.content)
+        return r.content
+
+    def crawl(self, urls, window=None):
+        # Yields (url, content) tuples in the order of urls. Up to window pages (twice the number of workers by default)
+        # are fetched ahead on the worker pool while the caller parses and converts the previous ones, so conversion
+        # and downloads overlap. If the caller stops early or raises, pages that are not being fetched yet are
+        # cancelled instead of downloaded.
+        if self.max_workers == 1:
+            for url in urls:
+                yield url, self.fetch(url)
+            return
+
+        window = window or 2 * self.max_workers
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            try:
+                for url in urls:
+                    pending.append((url, pool.submit(self.fetch, url)))
+                    if len(pending) >= window:
+                        url, future = pending.popleft()
+                        yield url, future.result()
+                while pending:
+                    url, future = pending.popleft()
+                    yield url, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
@@ -1,29 +1,62 @@
+import argparse
+import importlib.util
 import os
 import re
-import shutil
-import urllib.request
+import sys
 from datetime import datetime
 
 import frontmatter
 import html2markdown
 import pytz
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+from crawler import Crawler
+from snapshots import Checkpoint, SnapshotStore
+
+# make the modules shared with the fetch script importable
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.authors import AuthorResolver, person_id  # noqa: E402
+from common.content import ContentIndex  # noqa: E402
+from common.output import OutputWriter  # noqa: E402
 
 
 TEMPLATE_DIR = 'templates'
-CONTENT_DIR = '../../content'
 
 BIG_BASE = 'https://big.tuwien.ac.at'
 
-s = requests.Session()
+# names used by the old website that differ from the names of the profiles
+AUTHOR_TRANSFORM = {'Gerti Kappel': 'Gertrude Kappel'}
+
+# lxml is a lot faster than the parser of the standard library, but optional
+PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
 
+# the elements of a profile page that are read, everything else is skipped while parsing
+PROFILE_IDS = ['person-title', 'person-name', 'email', 'telephone', 'location', 'office-hours', 'profile',
+               'person-image']
 
-def _person_id(name):
-    if name == 'Gerti Kappel':
-        return 'gertrude-kappel'
-    return name.lower().replace(' ', '-').replace('ö', 'oe').replace('ä', 'ae').replace('ü', 'ue') \
-        .replace('ß', 'sz').replace(' ', '')
+# The migrations share a state dict, which is built by main:
+#   crawler     the Crawler fetching the pages of the old website
+#   checkpoint  the Checkpoint of the pages migrated by a previous, failed run
+#   writer      the OutputWriter of the migrated pages
+#   content     the ContentIndex of the content directory, existing pages are looked up in it instead of checking the
+#               file system for every migrated page
+#   parser      the html parser used by BeautifulSoup
+#   authors     the AuthorResolver of the existing profiles, created on first use
+
+
+def _person_id(state, name):
+    # people with a profile get its id, everyone else an id made from the name
+    if 'authors' not in state:
+        content = state['content']
+        authors = AuthorResolver(transform=AUTHOR_TRANSFORM)
+        for profile_id in content.ids('people'):
+            post = content.metadata(f'{content.content_dir}/people/{profile_id}/_index.md')
+            if post is not None:
+                authors.add_profile(profile_id, post.get('name') or profile_id)
+        state['authors'] = authors
+    authors = state['authors']
+    return authors.resolve(name) or person_id(authors.canonical(name))
 
 
 def _title_id(title):
@@ -33,35 +66,59 @@ def _title_id(title):
     return re.sub(r'[^a-zA-Z0-9\-]+', '', title).rstrip('-')
 
 
-def _prepare_resources(output_dir, identifier, fallback_template=None, create_directory=False, directory_file=None):
+def _prepare_resources(state, output_dir, identifier, fallback_template=None, create_directory=False,
+                       directory_file=None):
     # creates all necessary folders and reference to existing templates if they dont already exist
+    content_index = state['content']
     directory = f'{output_dir}/{identifier}'
 
-    if os.path.exists(f'{directory}.md'):
+    if content_index.exists(f'{directory}.md'):
         # check if file exists first
         return f'{directory}.md', output_dir, f'{identifier}.md'
-    elif os.path.exists(directory):
+    elif content_index.exists(directory):
         # check if directory exists
         return f'{directory}/{directory_file}', directory, directory_file
 
     print(f'Creating files for {identifier}')
     if create_directory:
         os.makedirs(directory)
+        content_index.add(directory)
         return fallback_template, directory, directory_file
     else:
         return fallback_template, output_dir, f'{identifier}.md'
 
 
-def migrate_big_profile(profile_url, output_dir, picture=True):
-    r = s.get(profile_url)
-    raw_html = r.content.decode()
-    soup = BeautifulSoup(raw_html, 'html.parser')
+def _write(state, path, post):
+    # writes a page and adds it to the content index, a page migrated again in the same run updates it
+    state['writer'].write(path, frontmatter.dumps(post))
+    state['content'].add(path)
+
+
+def _parse(state, raw_html, *ids):
+    # only builds the subtrees of the elements with the given ids, all other elements are dropped by the parser
+    return BeautifulSoup(raw_html, state['parser'], parse_only=SoupStrainer(id=list(ids)))
+
+
+def _migrate_pages(state, urls, migrate):
+    # calls migrate(url, raw_html) for every page that was not migrated by a previous, failed run
+    checkpoint = state['checkpoint']
+    for url, content in state['crawler'].crawl(url for url in urls if url not in checkpoint):
+        migrate(url, content.decode())
+        checkpoint.add(url)
+
+
+def _refs_to_urls(refs):
+    return [ref["href"] if ref["href"].startswith('http') else f'{BIG_BASE}{ref["href"]}' for ref in refs]
+
+
+def migrate_big_profile(state, raw_html, output_dir, picture=True):
+    soup = _parse(state, raw_html, *PROFILE_IDS)
 
     title = soup.select('#person-title')[0].string
     title = str(title) if title else None
     name = str(soup.select('#person-name')[0].string)
     name = str(name) if name else None
-    identifier = _person_id(name)
+    identifier = _person_id(state, name)
 
     email = soup.select('#email .general-info-text')
     email = str(email[0].string) if len(email) > 0 else None
@@ -80,7 +137,7 @@ def migrate_big_profile(profile_url, output_dir, picture=True):
 
     # create folder
     template_source, directory, file = _prepare_resources(
-        output_dir, identifier, create_directory=True, directory_file='_index.md',
+        state, output_dir, identifier, create_directory=True, directory_file='_index.md',
         fallback_template=f'{TEMPLATE_DIR}/authors/user/_index.md'
     )
 
@@ -88,9 +145,9 @@ def migrate_big_profile(profile_url, output_dir, picture=True):
         # download profile pic or copy default
         pic_dest = directory + '/avatar.jpg'
         if picture_uri:
-            urllib.request.urlretrieve(picture_uri, pic_dest)
+            state['writer'].write_bytes(pic_dest, state['crawler'].fetch(picture_uri))
         else:
-            shutil.copyfile(TEMPLATE_DIR + '/authors/user/avatar.jpg', pic_dest)
+            state['writer'].copy(TEMPLATE_DIR + '/authors/user/avatar.jpg', pic_dest)
 
     # apply metadata to markdown front matter
     post = frontmatter.load(template_source)
@@ -110,14 +167,11 @@ def migrate_big_profile(profile_url, output_dir, picture=True):
     post['pairs'] = pairs
     post.content = content_markdown
 
-    with open(f'{directory}/{file}', 'w+', encoding='utf-8') as f:
-        f.write(frontmatter.dumps(post))
+    _write(state, f'{directory}/{file}', post)
 
 
-def migrate_thesis(thesis_url, output_dir, ongoing, create=True):
-    r = s.get(thesis_url)
-    raw_html = r.content.decode()
-    soup = BeautifulSoup(raw_html, 'html.parser')
+def migrate_thesis(state, raw_html, output_dir, ongoing):
+    soup = _parse(state, raw_html, 'main')
     base = soup.select('#main')[0]
 
     title = str(base.find('h2').string)
@@ -129,14 +183,14 @@ def migrate_thesis(thesis_url, output_dir, ongoing, create=True):
     authors = metadata.find_all('em')
     authors = [str(a.string) for a in authors]
     advisors = metadata.find_all('a')
-    advisors = [_person_id(str(sup.string)) for sup in advisors]
+    advisors = [_person_id(state, str(sup.string)) for sup in advisors]
     ps = [str(p) for p in ps]
     content_html = ''.join(ps).replace('<span class="markdown">', '').replace('</span>', '')
     content_markdown = html2markdown.convert(content_html)
 
     # create folder
     template_source, directory, file = _prepare_resources(
-        output_dir, identifier, fallback_template=f'{TEMPLATE_DIR}/theses/thesis/index.md'
+        state, output_dir, identifier, fallback_template=f'{TEMPLATE_DIR}/theses/thesis/index.md'
     )
 
     # apply metadata to markdown front matter
@@ -149,14 +203,11 @@ def migrate_thesis(thesis_url, output_dir, ongoing, create=True):
 
     post.content = content_markdown
 
-    with open(f'{directory}/{file}', 'w+', encoding='utf-8') as f:
-        f.write(frontmatter.dumps(post))
+    _write(state, f'{directory}/{file}', post)
 
 
-def migrate_project(project_url, output_dir, ongoing):
-    r = s.get(project_url)
-    raw_html = r.content.decode()
-    soup = BeautifulSoup(raw_html, 'html.parser')
+def migrate_project(state, raw_html, output_dir, ongoing):
+    soup = _parse(state, raw_html, 'main')
     base = soup.select('#main')[0]
 
     title = str(base.find('h2').string)
@@ -176,7 +227,7 @@ def migrate_project(project_url, output_dir, ongoing):
 
     # create folder
     template_source, directory, file = _prepare_resources(
-        output_dir, identifier, fallback_template=f'{TEMPLATE_DIR}/projects/project/index.md'
+        state, output_dir, identifier, fallback_template=f'{TEMPLATE_DIR}/projects/project/index.md'
     )
 
     # apply metadata to markdown front matter
@@ -188,111 +239,93 @@ def migrate_project(project_url, output_dir, ongoing):
 
     post.content = content_markdown
 
-    with open(f'{directory}/{file}', 'w+', encoding='utf-8') as f:
-        f.write(frontmatter.dumps(post))
+    _write(state, f'{directory}/{file}', post)
 
 
-def migrate_people():
+def migrate_people(state):
     url = f'{BIG_BASE}/people/'
-    output_dir = CONTENT_DIR + '/people'
+    output_dir = state['content'].content_dir + '/people'
 
-    r = s.get(url)
-    raw_html = r.content.decode()
-    soup = BeautifulSoup(raw_html, 'html.parser')
+    raw_html = state['crawler'].fetch(url).decode()
+    soup = _parse(state, raw_html, 'main')
     profile_refs = soup.select('#main a')
     profile_refs = [a for a in profile_refs if a['href'].startswith('/people') and
                     'visitors-and-friends' not in a['href']]
 
-    for ref in profile_refs:
-        url = f'{BIG_BASE}{ref["href"]}'
-        if BIG_BASE not in url:
-            print(url)
-            continue
-        migrate_big_profile(url, output_dir, picture=False)
+    urls = [f'{BIG_BASE}{ref["href"]}' for ref in profile_refs]
+    _migrate_pages(state, urls, lambda url, raw_html: migrate_big_profile(state, raw_html, output_dir, picture=False))
 
 
-def migrate_visitors_and_friends():
+def migrate_visitors_and_friends(state):
     url = f'{BIG_BASE}/people/visitors-and-friends/'
-    output_dir = CONTENT_DIR + '/people'
+    output_dir = state['content'].content_dir + '/people'
 
-    r = s.get(url)
-    raw_html = r.content.decode()
-    soup = BeautifulSoup(raw_html, 'html.parser')
+    raw_html = state['crawler'].fetch(url).decode()
+    soup = _parse(state, raw_html, 'main')
     profile_refs = soup.select('#main a')
 
-    for ref in profile_refs:
-        url = ref["href"] if ref["href"].startswith('http') else f'{BIG_BASE}{ref["href"]}'
+    urls = _refs_to_urls(profile_refs)
+    # profiles hosted elsewhere are only reported
+    for url in urls:
         if BIG_BASE not in url:
             print(url)
-            continue
-        migrate_big_profile(url, output_dir)
+
+    _migrate_pages(state, [url for url in urls if BIG_BASE in url],
+                   lambda url, raw_html: migrate_big_profile(state, raw_html, output_dir))
 
 
-def migrate_master_theses():
+def migrate_master_theses(state):
     url = f'{BIG_BASE}/teaching/masters-theses/'
-    output_dir = CONTENT_DIR + '/master-thesis'
+    output_dir = state['content'].content_dir + '/master-thesis'
 
-    r = s.get(url)
-    raw_html = r.content.decode()
-    soup = BeautifulSoup(raw_html, 'html.parser')
+    raw_html = state['crawler'].fetch(url).decode()
+    soup = _parse(state, raw_html, 'main')
     ongoing_refs = soup.select('#main td[headers="thesisTitle ongoing"] a')
     finished_refs = soup.select('#main td[headers="thesisTitle finished"] a')
 
-    for ref in ongoing_refs:
-        url = ref["href"] if ref["href"].startswith('http') else f'{BIG_BASE}{ref["href"]}'
-        migrate_thesis(url, output_dir, ongoing=True)
-
-    for ref in finished_refs:
-        url = ref["href"] if ref["href"].startswith('http') else f'{BIG_BASE}{ref["href"]}'
-        migrate_thesis(url, output_dir, ongoing=False)
+    # ongoing and finished theses are crawled together, so the pool does not drain in between
+    ongoing_urls = _refs_to_urls(ongoing_refs)
+    _migrate_pages(state, ongoing_urls + _refs_to_urls(finished_refs),
+                   lambda url, raw_html: migrate_thesis(state, raw_html, output_dir, ongoing=url in ongoing_urls))
 
 
-def migrate_phd_theses():
+def migrate_phd_theses(state):
     url = f'{BIG_BASE}/teaching/phd-theses/'
-    output_dir = CONTENT_DIR + '/phd-thesis'
+    output_dir = state['content'].content_dir + '/phd-thesis'
 
-    r = s.get(url)
-    raw_html = r.content.decode()
-    soup = BeautifulSoup(raw_html, 'html.parser')
+    raw_html = state['crawler'].fetch(url).decode()
+    soup = _parse(state, raw_html, 'main')
     ongoing_refs = soup.select('#main td[headers="thesisTitle ongoing"] a')
     finished_refs = soup.select('#main td[headers="thesisTitle finished"] a')
 
-    for ref in ongoing_refs:
-        url = ref["href"] if ref["href"].startswith('http') else f'{BIG_BASE}{ref["href"]}'
-        migrate_thesis(url, output_dir, ongoing=True)
+    # ongoing and finished theses are crawled together, so the pool does not drain in between
+    ongoing_urls = _refs_to_urls(ongoing_refs)
+    _migrate_pages(state, ongoing_urls + _refs_to_urls(finished_refs),
+                   lambda url, raw_html: migrate_thesis(state, raw_html, output_dir, ongoing=url in ongoing_urls))
 
-    for ref in finished_refs:
-        url = ref["href"] if ref["href"].startswith('http') else f'{BIG_BASE}{ref["href"]}'
-        migrate_thesis(url, output_dir, ongoing=False)
 
-
-def migrate_projects():
+def migrate_projects(state):
     url = f'{BIG_BASE}/projects/'
-    output_dir = CONTENT_DIR + '/project'
+    output_dir = state['content'].content_dir + '/project'
 
-    r = s.get(url)
-    raw_html = r.content.decode()
-    soup = BeautifulSoup(raw_html, 'html.parser')
+    raw_html = state['crawler'].fetch(url).decode()
+    soup = _parse(state, raw_html, 'main')
     project_list_refs = soup.select('#main .projectList')
     ongoing_refs = project_list_refs[0].select('a')
     finished_refs = project_list_refs[1].select('a')
 
-    for ref in ongoing_refs:
-        url = ref["href"] if ref["href"].startswith('http') else f'{BIG_BASE}{ref["href"]}'
-        migrate_project(url, output_dir, ongoing=True)
-
-    for ref in finished_refs:
-        url = ref["href"] if ref["href"].startswith('http') else f'{BIG_BASE}{ref["href"]}'
-        migrate_project(url, output_dir, ongoing=False)
+    # ongoing and finished projects are crawled together, so the pool does not drain in between
+    ongoing_urls = _refs_to_urls(ongoing_refs)
+    _migrate_pages(state, ongoing_urls + _refs_to_urls(finished_refs),
+                   lambda url, raw_html: migrate_project(state, raw_html, output_dir, ongoing=url in ongoing_urls))
 
 
-def migrate_news():
+def migrate_news(state):
     url = f'{BIG_BASE}/news/'
-    output_dir = CONTENT_DIR + '/news'
+    output_dir = state['content'].content_dir + '/news'
 
-    r = s.get(url)
-    raw_html = r.content.decode()
-    soup = BeautifulSoup(raw_html, 'html.parser')
+    raw_html = state['crawler'].fetch(url).decode()
+    soup = _parse(state, raw_html, 'main')
     news_refs = soup.select('#main > *')
 
     year = None
@@ -313,9 +346,10 @@ def migrate_news():
         file = 'index.md'
         template_source = TEMPLATE_DIR + '/news/demo/index.md'
 
-        if not os.path.exists(directory):
+        if not state['content'].exists(directory):
             print(f'Creating news files for "{title}"')
             os.makedirs(directory)
+            state['content'].add(directory)
         else:
             template_source = directory + '/' + file
 
@@ -326,21 +360,85 @@ def migrate_news():
 
         post.content = content_markdown
 
-        with open(f'{directory}/{file}', 'w+', encoding='utf-8') as f:
-            f.write(frontmatter.dumps(post))
+        _write(state, f'{directory}/{file}', post)
 
 
 def main():
     # THIS SCRIPT WAS USED TO MIGRATE THE CONTENT OF THE OLD WEBSITE TO THE NEW ONE.
     # PROBABLY WONT BE OF USE IN THE FUTURE
 
-    # migrate_people()
-    # migrate_visitors_and_friends()
-    # migrate_master_theses()
-    # migrate_phd_theses()
-    # migrate_projects()
-    # migrate_news()
-    pass
+    migrations = {
+        'people': migrate_people,
+        'visitors': migrate_visitors_and_friends,
+        'master_theses': migrate_master_theses,
+        'phd_theses': migrate_phd_theses,
+        'projects': migrate_projects,
+        'news': migrate_news,
+    }
+
+    argparser = argparse.ArgumentParser(description='BIG website migration script.')
+    for name in migrations:
+        argparser.add_argument('--' + name.replace('_', '-'),
+                               help=f'migrate {name.replace("_", " ")} of the old website', action='store_true',
+                               dest=name)
+    argparser.add_argument('-b', '--base',
+                           help='provide the project base dir. Defaults to "../.."',
+                           default='../..',
+                           metavar='PATH', dest='base_path')
+    argparser.add_argument('-w', '--workers',
+                           help='maximum number of concurrent requests. Defaults to 8',
+                           default=8, type=int,
+                           metavar='N', dest='workers')
+    argparser.add_argument('--rate',
+                           help='maximum number of requests per second and host. Defaults to 10',
+                           default=10.0, type=float,
+                           metavar='N', dest='rate')
+    argparser.add_argument('--snapshots',
+                           help='provide the path of the page snapshots. Defaults to ".snapshots"',
+                           default='.snapshots',
+                           metavar='PATH', dest='snapshot_dir')
+    argparser.add_argument('--refetch',
+                           help='download all pages again instead of using the snapshots', action='store_true',
+                           dest='refetch')
+    argparser.add_argument('--offline',
+                           help='only use the snapshots, fail for pages without snapshot', action='store_true',
+                           dest='offline')
+    argparser.add_argument('--checkpoint',
+                           help='provide the path of the checkpoint file. Defaults to "migrate.checkpoint.json"',
+                           default='migrate.checkpoint.json',
+                           metavar='PATH', dest='checkpoint_path')
+    argparser.add_argument('--restart',
+                           help='ignore the checkpoint of a failed run and migrate all pages', action='store_true',
+                           dest='restart')
+    argparser.add_argument('--parser',
+                           help=f'html parser used by BeautifulSoup. Defaults to "{PARSER}"',
+                           default=PARSER, choices=['lxml', 'html.parser'],
+                           dest='parser')
+    args = argparser.parse_args()
+
+    selected = [migrate for name, migrate in migrations.items() if getattr(args, name)]
+    if not selected:
+        print('Aborting as there is nothing to do. Run with "-h" for help.')
+        return
+
+    crawler = Crawler(requests.Session(), max_workers=args.workers, rate=args.rate,
+                      snapshots=SnapshotStore(args.snapshot_dir), refetch=args.refetch, offline=args.offline)
+
+    checkpoint = Checkpoint(args.checkpoint_path)
+    if args.restart:
+        checkpoint.clear()
+    elif checkpoint.urls:
+        print(f'Resuming a failed run, skipping {len(checkpoint.urls)} migrated pages. Run with "--restart" to '
+              f'migrate them again.')
+
+    state = {'crawler': crawler, 'checkpoint': checkpoint, 'writer': OutputWriter(),
+             'content': ContentIndex(args.base_path.rstrip('/') + '/content'), 'parser': args.parser}
+    for migrate in selected:
+        migrate(state)
+
+    # the run finished, the next one starts from the beginning
+    checkpoint.clear()
+    print(f'Output: {state["writer"].summary()}.')
 
 
 if __name__ == '__main__':
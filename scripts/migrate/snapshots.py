@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import threading
+
+
+def _write_atomic(path, content):
+    # content is written to a temp file first, a crash never leaves a truncated file behind
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class SnapshotStore:
+    # Keeps a copy of every fetched page on disk. Page contents are stored under their sha256, an index maps urls to
+    # their content, so identical pages (e.g. error pages) are only stored once.
+    # Layout: <directory>/index.json and <directory>/objects/<first two chars of the hash>/<hash>
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._index_path = f'{directory}/index.json'
+        self._lock = threading.Lock()
+        self.index = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    def _object_path(self, key):
+        return f'{self.directory}/objects/{key[:2]}/{key}'
+
+    def get(self, url):
+        key = self.index.get(url)
+        if not key:
+            return None
+        try:
+            with open(self._object_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, url, content):
+        key = hashlib.sha256(content).hexdigest()
+        path = self._object_path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, content)
+
+        # the index is written on every new page, so pages fetched before a crash are never downloaded again
+        with self._lock:
+            self.index[url] = key
+            _write_atomic(self._index_path, json.dumps(self.index, indent=4, sort_keys=True).encode('utf-8'))
+
+
+class Checkpoint:
+    # Records the urls that were migrated, so a failed run can be resumed where it stopped.
+    # The file is removed once a run finishes, the next run then starts from the beginning again.
+
+    def __init__(self, path):
+        self.path = path
+        self.urls = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.urls = set(json.load(f))
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def add(self, url):
+        self.urls.add(url)
+        _write_atomic(self.path, json.dumps(sorted(self.urls), indent=4).encode('utf-8'))
+
+    def clear(self):
+        self.urls = set()
+        if os.path.exists(self.path):
+            os.remove(self.path)